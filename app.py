@@ -1,852 +1,3238 @@
-import streamlit as st
-import pandas as pd
-import re
-import json
-import hashlib
-import base64
-import requests
-from datetime import datetime
-from urllib.parse import urlparse, parse_qs
-import io
-
-# Configuración de la página
-st.set_page_config(page_title="Gestor de Sugerencias Musicales", page_icon="🎵", layout="wide")
-
-# Configuración de GitHub - Estos valores deben estar en tu archivo secrets.toml
-if 'github' not in st.secrets:
-    st.error("Se requiere configuración de GitHub en secrets.toml")
-    st.stop()
-
-GITHUB_TOKEN = st.secrets["github"]["token"]
-GITHUB_REPO = st.secrets["github"]["repo"]
-GITHUB_OWNER = st.secrets["github"]["owner"]
-GITHUB_BRANCH = st.secrets.get("github", {}).get("branch", "main")
-
-# Función para extraer el ID de YouTube de una URL
-def extract_youtube_id(url):
-    # Patrones comunes de URLs de YouTube
-    youtube_regex = (
-        r'(https?://)?(www\.)?'
-        '(youtube|youtu|youtube-nocookie)\.(com|be)/'
-        '(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})')
-    
-    youtube_regex_match = re.match(youtube_regex, url)
-    if youtube_regex_match:
-        return youtube_regex_match.group(6)
-    
-    # Para URLs acortadas (youtu.be)
-    if 'youtu.be' in url:
-        parsed_url = urlparse(url)
-        return parsed_url.path.lstrip('/')
-    
-    # Para URLs normales (youtube.com/watch?v=)
-    parsed_url = urlparse(url)
-    if parsed_url.hostname in ('youtu.be', 'www.youtu.be', 'youtube.com', 'www.youtube.com'):
-        if 'v' in parse_qs(parsed_url.query):
-            return parse_qs(parsed_url.query)['v'][0]
-    
-    return None
-
-# Función para obtener información básica del video
-def get_video_info(video_id):
-    # En una implementación real se usaría la API de YouTube
-    # Implementación simulada para el ejemplo
-    try:
-        if video_id and len(video_id) == 11:
-            return {
-                "id": video_id,
-                "title": f"Video {video_id[:4]}...",  # Título simulado
-                "thumbnail": f"https://img.youtube.com/vi/{video_id}/0.jpg"
-            }
-    except Exception as e:
-        st.error(f"Error al obtener información del video: {e}")
-    
-    return None
-
-# Funciones para manejar GitHub como almacenamiento
-def get_github_file(file_path):
-    """Obtiene el contenido de un archivo desde GitHub"""
-    url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/contents/{file_path}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    params = {"ref": GITHUB_BRANCH}
-    
-    try:
-        # Establecer un timeout para evitar esperas infinitas
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            content = response.json()
-            file_content = base64.b64decode(content["content"]).decode("utf-8")
-            return file_content, content["sha"]
-        elif response.status_code == 404:
-            # El archivo no existe
-            st.info(f"El archivo {file_path} no existe en el repositorio. Se creará uno nuevo.")
-            return None, None
-        else:
-            st.error(f"Error al obtener archivo de GitHub: {response.status_code} - {response.text}")
-            return None, None
-    except requests.exceptions.Timeout:
-        st.error("Tiempo de espera agotado al conectar con GitHub. Verifica tu conexión a internet.")
-        return None, None
-    except Exception as e:
-        st.error(f"Error inesperado al obtener archivo de GitHub: {str(e)}")
-        return None, None
-
-def update_github_file(file_path, content, sha=None, commit_message=None):
-    """Actualiza o crea un archivo en GitHub"""
-    url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/contents/{file_path}"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    if not commit_message:
-        commit_message = f"Actualización automática de {file_path}"
-    
-    data = {
-        "message": commit_message,
-        "content": base64.b64encode(content.encode("utf-8")).decode("utf-8"),
-        "branch": GITHUB_BRANCH
-    }
-    
-    # Si no se proporciona SHA, intentar obtenerlo primero
-    if sha is None:
-        try:
-            # Verificar si el archivo existe y obtener su SHA
-            check_url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/contents/{file_path}"
-            check_response = requests.get(check_url, headers=headers, params={"ref": GITHUB_BRANCH})
-            
-            if check_response.status_code == 200:
-                # El archivo existe, obtener el SHA
-                existing_file = check_response.json()
-                sha = existing_file["sha"]
-                data["sha"] = sha
-            elif check_response.status_code != 404:
-                # Si no es 404 (archivo no encontrado), hay un error diferente
-                st.error(f"Error al verificar archivo: {check_response.status_code} - {check_response.text}")
-                return False
-            # Si es 404, el archivo no existe y es correcto no incluir SHA
-        except Exception as e:
-            st.error(f"Error al verificar SHA del archivo: {e}")
-            return False
-    else:
-        data["sha"] = sha
-    
-    try:
-        response = requests.put(url, headers=headers, json=data)
-        
-        if response.status_code in [200, 201]:
-            return True
-        else:
-            details = {}
-            try:
-                details = response.json()
-            except:
-                details = {"text": response.text}
-            
-            error_msg = f"Error al actualizar archivo en GitHub: {response.status_code}"
-            if details:
-                error_msg += f"\nDetalles: {details}"
-            
-            st.error(error_msg)
-            return False
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error de conexión: {e}")
-        return False
-
-# Verificar configuración de GitHub
-if 'github' not in st.secrets:
-    st.error("No se encontró la configuración de GitHub en secrets.toml")
-    st.stop()
-
-GITHUB_TOKEN = st.secrets["github"]["token"]
-GITHUB_REPO = st.secrets["github"]["repo"]
-GITHUB_OWNER = st.secrets["github"]["owner"]
-GITHUB_BRANCH = st.secrets.get("github", {}).get("branch", "main")
-
-# Verificar que los valores no estén vacíos
-if not GITHUB_TOKEN or not GITHUB_REPO or not GITHUB_OWNER:
-    st.error("Configuración de GitHub incompleta en secrets.toml")
-    st.write("Por favor, verifica los siguientes valores:")
-    if not GITHUB_TOKEN:
-        st.write("- Token de GitHub")
-    if not GITHUB_REPO:
-        st.write("- Nombre del repositorio")
-    if not GITHUB_OWNER:
-        st.write("- Nombre del propietario")
-    st.stop()
-
-# Verificar la conexión a GitHub
-test_url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}"
-headers = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github.v3+json"
-}
-
-try:
-    response = requests.get(test_url, headers=headers)
-    response.raise_for_status()
-    st.success("Conexión a GitHub establecida correctamente")
-except Exception as e:
-    st.error(f"Error al conectar con GitHub: {e}")
-    st.write("Por favor, verifica la configuración en secrets.toml")
-    st.stop()
-
-# Funciones para manejar usuarios
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def load_users():
-    # Intentar obtener el archivo de GitHub
-    try:
-        content, sha = get_github_file('usuarios.json')
-        
-        if content:
-            users = json.loads(content)
-            # Guardar el SHA para futuras actualizaciones
-            st.session_state['users_sha'] = sha
-            return users
-        else:
-            # Usuario admin por defecto
-            default_users = {
-                "admin": {
-                    "password": hashlib.sha256("admin123".encode()).hexdigest(),
-                    "nombre": "JeZz Barrientos",
-                    "rol": "admin"
-                }
-            }
-            
-            # Intentar crear el archivo en GitHub, pero no reintentar si falla
-            try:
-                json_content = json.dumps(default_users, indent=2)
-                update_github_file('usuarios.json', json_content, commit_message="Creación inicial de usuarios.json")
-                # No llamar a load_users() de nuevo para evitar recursión
-            except Exception as e:
-                st.warning(f"No se pudo crear el archivo de usuarios en GitHub: {str(e)}")
-                st.info("Usando usuarios predeterminados en memoria temporalmente")
-            
-            return default_users
-    except Exception as e:
-        st.error(f"Error al cargar usuarios: {str(e)}")
-        # Devolver un conjunto predeterminado de usuarios para que la aplicación funcione
-        return {
-            "admin": {
-                "password": hashlib.sha256("admin123".encode()).hexdigest(),
-                "nombre": "Administrador",
-                "rol": "admin"
-            }
-        }
-def save_users(users):
-    """Guarda el diccionario de usuarios en GitHub"""
-    # Obtener el SHA del estado de sesión o establecer como None si no existe
-    sha = st.session_state.get('users_sha')
-    json_content = json.dumps(users, indent=2)
-    
-    if update_github_file('usuarios.json', json_content, sha):
-        # Limpiar cache para forzar recarga en próxima llamada
-        load_users.clear()
-        return True
-    return False
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def check_credentials(username, password):
-    users = load_users()
-    if username in users and users[username]["password"] == hash_password(password):
-        return True
-    return False
-
-def get_user_info(username):
-    users = load_users()
-    return users.get(username, {})
-
-def change_password(username, new_password):
-    users = load_users()
-    if username in users:
-        users[username]["password"] = hash_password(new_password)
-        return save_users(users)
-    return False
-
-def reset_password(username, new_password):
-    return change_password(username, new_password)
-
-# Función auxiliar para crear un DataFrame vacío con la estructura correcta
-def create_empty_songs_dataframe():
-    return pd.DataFrame({
-        'youtube_id': [],
-        'url': [],
-        'titulo_cancion': [],
-        'artista': [],
-        'genero': [],
-        'dificultad': [],
-        'sugerido_por': [],
-        'fecha_sugerencia': [],
-        'notas': [],
-        'votos_count': []
-    })
-    
-# Funciones para manejar canciones
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def load_data():
-    try:
-        content, sha = get_github_file('canciones_sugeridas.csv')
-        
-        if content and sha:
-            # Guardar el SHA para futuras actualizaciones
-            st.session_state['canciones_sha'] = sha
-            try:
-                return pd.read_csv(io.StringIO(content))
-            except Exception as e:
-                st.error(f"Error al parsear el CSV: {str(e)}")
-                # Crear un DataFrame vacío como fallback
-                df = create_empty_songs_dataframe()
-                return df
-        else:
-            # Crear DataFrame vacío
-            df = create_empty_songs_dataframe()
-            
-            # Guardar el archivo vacío en GitHub
-            csv_content = df.to_csv(index=False)
-            # No proporcionar SHA para la creación inicial
-            update_github_file('canciones_sugeridas.csv', csv_content, sha=None, commit_message="Creación inicial de canciones_sugeridas.csv")
-            
-            # Intentar cargar de nuevo después de crear
-            return load_data()
-    except Exception as e:
-        st.error(f"Error al cargar datos: {str(e)}")
-        # En caso de error, devolver un DataFrame vacío
-        return create_empty_songs_dataframe()
-
-# Función auxiliar para crear un DataFrame vacío con la estructura correcta
-def create_empty_songs_dataframe():
-    return pd.DataFrame({
-        'youtube_id': [],
-        'url': [],
-        'titulo_cancion': [],
-        'artista': [],
-        'genero': [],
-        'dificultad': [],
-        'sugerido_por': [],
-        'fecha_sugerencia': [],
-        'notas': [],
-        'votos_count': []
-    })
-
-def save_data(df):
-    """Guarda el DataFrame de canciones en GitHub"""
-    # Obtener el SHA del estado de sesión o establecer como None si no existe
-    sha = st.session_state.get('canciones_sha')
-    csv_content = df.to_csv(index=False)
-    
-    if update_github_file('canciones_sugeridas.csv', csv_content, sha):
-        # Limpiar cache para forzar recarga en próxima llamada
-        load_data.clear()
-        return True
-    return False
-
-def video_exists(video_id, data):
-    return video_id in data['youtube_id'].values
-
-@st.cache_data(ttl=300)  # Cache por 5 minutos
-def load_votes():
-    try:
-        content, sha = get_github_file('votos.json')
-        
-        if content:
-            try:
-                votes = json.loads(content)
-                # Guardar el SHA para futuras actualizaciones
-                st.session_state['votos_sha'] = sha
-                return votes
-            except json.JSONDecodeError as e:
-                st.error(f"Error al decodificar JSON de votos: {str(e)}")
-                return {}
-        else:
-            # Crear objeto vacío
-            empty_votes = {}
-            
-            # Guardar el archivo vacío en GitHub
-            json_content = json.dumps(empty_votes, indent=2)
-            update_github_file('votos.json', json_content, commit_message="Creación inicial de votos.json")
-            
-            return empty_votes
-    except Exception as e:
-        st.error(f"Error al cargar votos: {str(e)}")
-        return {}
-
-def save_votes(votes):
-    """Guarda el diccionario de votos en GitHub"""
-    # Obtener el SHA del estado de sesión o establecer como None si no existe
-    sha = st.session_state.get('votos_sha')
-    json_content = json.dumps(votes, indent=2)
-    
-    if update_github_file('votos.json', json_content, sha):
-        # Limpiar cache para forzar recarga en próxima llamada
-        load_votes.clear()
-        return True
-    return False
-
-def vote_song(youtube_id, username, vote_value=True):
-    votes = load_votes()
-    if youtube_id not in votes:
-        votes[youtube_id] = {}
-    votes[youtube_id][username] = vote_value
-    
-    if save_votes(votes):
-        update_vote_counts()
-        return True
-    return False
-
-def get_vote_count(youtube_id):
-    votes = load_votes()
-    if youtube_id not in votes:
-        return 0
-    return sum(1 for v in votes[youtube_id].values() if v)
-
-def user_has_voted(youtube_id, username):
-    votes = load_votes()
-    if youtube_id not in votes:
-        return False
-    return username in votes[youtube_id] and votes[youtube_id][username]
-
-def update_vote_counts():
-    data = load_data()
-    votes = load_votes()
-    
-    # Asegurarse de que la columna de votos existe
-    if 'votos_count' not in data.columns:
-        data['votos_count'] = 0
-    
-    # Actualizar conteo de votos
-    for i, row in data.iterrows():
-        youtube_id = row['youtube_id']
-        if youtube_id in votes:
-            data.at[i, 'votos_count'] = sum(1 for v in votes[youtube_id].values() if v)
-        else:
-            data.at[i, 'votos_count'] = 0
-    
-    save_data(data)
-
-# Función para la página de inicio de sesión
-def login_page():
-    st.title("🎵 P27 - Gestor de Sugerencias")
-    st.header("Iniciar Sesión")
-    
-    # Verificar si hay un mensaje de redirección
-    if 'show_login_message' in st.session_state and st.session_state.show_login_message:
-        st.success("Inicio de sesión exitoso! Redirigiendo...")
-        # Limpiar el flag después de mostrar el mensaje
-        st.session_state.show_login_message = False
-        # Código JavaScript para recargar después de 1 segundo
-        st.markdown(
-            """
-            <script>
-                setTimeout(function() {
-                    window.location.reload();
-                }, 1000);
-            </script>
-            """,
-            unsafe_allow_html=True
-        )
-    
-    login_col1, login_col2 = st.columns([1, 1])
-    
-    with login_col1:
-        with st.form("login_form"):
-            username = st.text_input("Usuario")
-            password = st.text_input("Contraseña", type="password")
-            submitted = st.form_submit_button("Iniciar Sesión")
-            
-            if submitted:
-                if check_credentials(username, password):
-                    # Actualizar estado de sesión
-                    st.session_state.logged_in = True
-                    st.session_state.username = username
-                    st.session_state.user_info = get_user_info(username)
-                    st.session_state.show_login_message = True
-                    st.rerun()  # Intentar rerun aquí es más seguro ahora
-                else:
-                    st.error("Usuario o contraseña incorrectos")
-        
-        # Enlace para recuperar contraseña
-        st.markdown("---")
-        st.markdown("¿Olvidaste tu contraseña? Contacta al administrador para restablecerla.")
-    
-    with login_col2:
-        st.info("Si eres miembro del grupo y no tienes cuenta, contacta al administrador para que te registre.")
-        
-# Función para cambiar contraseña del usuario
-def change_password_page():
-    st.header("Cambiar Contraseña")
-    
-    with st.form("change_password_form"):
-        current_password = st.text_input("Contraseña Actual", type="password")
-        new_password = st.text_input("Nueva Contraseña", type="password")
-        confirm_password = st.text_input("Confirmar Nueva Contraseña", type="password")
-        
-        submitted = st.form_submit_button("Cambiar Contraseña")
-        
-        if submitted:
-            username = st.session_state.username
-            
-            if not check_credentials(username, current_password):
-                st.error("La contraseña actual es incorrecta")
-            elif new_password != confirm_password:
-                st.error("Las nuevas contraseñas no coinciden")
-            elif not new_password:
-                st.error("La nueva contraseña no puede estar vacía")
-            else:
-                if change_password(username, new_password):
-                    st.success("Contraseña cambiada correctamente")
-                    # Actualizar información de sesión
-                    st.session_state.user_info = get_user_info(username)
-                else:
-                    st.error("Error al cambiar la contraseña")
-
-# Función para la página de administración de usuarios
-def admin_page():
-    st.title("Administración de Usuarios")
-    
-    # Mostrar usuarios existentes
-    users = load_users()
-    
-    st.header("Usuarios Registrados")
-    
-    user_df = pd.DataFrame([
-        {"Usuario": username, "Nombre": info["nombre"], "Rol": info["rol"]}
-        for username, info in users.items()
-    ])
-    
-    st.table(user_df)
-    
-    # Agregar nuevo usuario
-    st.header("Agregar Nuevo Usuario")
-    
-    with st.form("new_user_form"):
-        new_username = st.text_input("Nombre de Usuario")
-        new_password = st.text_input("Contraseña", type="password")
-        new_nombre = st.text_input("Nombre Completo")
-        new_rol = st.selectbox("Rol", ["miembro", "admin"])
-        
-        submit_new_user = st.form_submit_button("Registrar Usuario")
-        
-        if submit_new_user:
-            if new_username in users:
-                st.error("Este nombre de usuario ya está en uso")
-            elif not new_username or not new_password or not new_nombre:
-                st.error("Todos los campos son requeridos")
-            else:
-                users[new_username] = {
-                    "password": hash_password(new_password),
-                    "nombre": new_nombre,
-                    "rol": new_rol
-                }
-                if save_users(users):
-                    st.success(f"Usuario {new_username} registrado correctamente")
-                    # En lugar de usar st.experimental_rerun() directamente
-                    st.session_state.admin_refresh = True
-                else:
-                    st.error("Error al guardar el nuevo usuario")
-        
-        # Al inicio de la función, verificar si necesitamos recargar
-        if 'admin_refresh' in st.session_state and st.session_state.admin_refresh:
-            st.session_state.admin_refresh = False
-            st.rerun()
-    
-    # Sección para restablecer contraseñas
-    st.header("Restablecer Contraseña de Usuario")
-    
-    with st.form("reset_password_form"):
-        username_to_reset = st.selectbox("Seleccionar Usuario", list(users.keys()))
-        new_password_reset = st.text_input("Nueva Contraseña", type="password", key="reset_pwd")
-        confirm_reset = st.text_input("Confirmar Nueva Contraseña", type="password", key="confirm_reset")
-        
-        submit_reset = st.form_submit_button("Restablecer Contraseña")
-        
-        if submit_reset:
-            if not new_password_reset:
-                st.error("La nueva contraseña no puede estar vacía")
-            elif new_password_reset != confirm_reset:
-                st.error("Las contraseñas no coinciden")
-            else:
-                if reset_password(username_to_reset, new_password_reset):
-                    st.success(f"Contraseña del usuario {username_to_reset} restablecida correctamente")
-                else:
-                    st.error("Error al restablecer la contraseña")
-
-# Función para la aplicación principal
-def main_app():
-    # Título y pestañas principales
-    st.title("🎵 Gestor de Sugerencias Musicales")
-    st.markdown(f"Bienvenido, {st.session_state.user_info['nombre']} | "
-                f"[Cerrar Sesión](javascript:sessionStorage.clear();location.reload())")
-    
-    tabs = ["Nueva Sugerencia", "Ver Sugerencias", "Estadísticas", "Mi Cuenta"]
-    
-    # Si es administrador, mostrar pestaña de administración
-    if st.session_state.user_info.get("rol") == "admin":
-        tabs.append("Administración")
-    
-    tab_selection = st.tabs(tabs)
-    
-    # Pestaña 1: Nueva Sugerencia
-    with tab_selection[0]:
-        st.header("Añadir Nueva Sugerencia")
-        
-        data = load_data()
-        
-        with st.form("nueva_sugerencia"):
-            youtube_url = st.text_input("URL de YouTube:")
-            titulo_cancion = st.text_input("Título de la Canción:")
-            artista = st.text_input("Artista:")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                genero = st.selectbox("Género:", ["Rock", "Pop", "Metal", "Jazz", "Electrónica", "Folk", "Otro"])
-                dificultad = st.select_slider("Dificultad estimada:", options=["Fácil", "Intermedia", "Difícil", "Muy difícil"])
-            
-            with col2:
-                # El nombre del usuario se obtiene automáticamente
-                sugerido_por = st.session_state.user_info['nombre']
-                st.write(f"Sugerido por: {sugerido_por}")
-                notas = st.text_area("Notas adicionales:", height=100)
-            
-            submitted = st.form_submit_button("Enviar Sugerencia")
-            
-            if submitted:
-                if not youtube_url:
-                    st.error("Por favor, ingresa la URL de YouTube.")
-                else:
-                    video_id = extract_youtube_id(youtube_url)
-                    
-                    if not video_id:
-                        st.error("URL de YouTube no válida. Por favor, verifica e intenta de nuevo.")
-                    elif video_exists(video_id, data):
-                        st.error("¡Esta canción ya ha sido sugerida! Revisa la lista de sugerencias existentes.")
-                    else:
-                        video_info = get_video_info(video_id)
-                        
-                        if not video_info:
-                            st.error("No se pudo obtener información del video. Verifica la URL.")
-                        else:
-                            if not titulo_cancion:
-                                titulo_cancion = video_info["title"]
-                            
-                            nueva_sugerencia = {
-                                'youtube_id': video_id,
-                                'url': youtube_url,
-                                'titulo_cancion': titulo_cancion,
-                                'artista': artista,
-                                'genero': genero,
-                                'dificultad': dificultad,
-                                'sugerido_por': sugerido_por,
-                                'fecha_sugerencia': datetime.now().strftime('%Y-%m-%d'),
-                                'notas': notas,
-                                'votos_count': 0
-                            }
-                            
-                            data = pd.concat([data, pd.DataFrame([nueva_sugerencia])], ignore_index=True)
-                            if save_data(data):
-                                st.success("¡Sugerencia añadida correctamente!")
-                                st.balloons()
-                            else:
-                                st.error("Error al guardar la sugerencia")
-    
-    # Pestaña 2: Ver Sugerencias
-    with tab_selection[1]:
-        st.header("Canciones Sugeridas")
-        
-        data = load_data()
-        update_vote_counts()  # Actualizar conteo de votos
-        
-        if data.empty:
-            st.info("Aún no hay sugerencias de canciones.")
-        else:
-            # Filtros
-            st.subheader("Filtros")
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                filtro_genero = st.multiselect("Filtrar por género:", ["Todos"] + sorted(data['genero'].unique().tolist()))
-            
-            with col2:
-                filtro_dificultad = st.multiselect("Filtrar por dificultad:", ["Todos"] + sorted(data['dificultad'].unique().tolist()))
-            
-            with col3:
-                filtro_persona = st.multiselect("Filtrar por persona:", ["Todos"] + sorted(data['sugerido_por'].unique().tolist()))
-            
-            with col4:
-                orden = st.selectbox("Ordenar por:", ["Más recientes", "Más antiguas", "Más votadas", "Título"])
-            
-            # Aplicar filtros
-            data_filtrada = data.copy()
-            
-            if filtro_genero and "Todos" not in filtro_genero:
-                data_filtrada = data_filtrada[data_filtrada['genero'].isin(filtro_genero)]
-            
-            if filtro_dificultad and "Todos" not in filtro_dificultad:
-                data_filtrada = data_filtrada[data_filtrada['dificultad'].isin(filtro_dificultad)]
-            
-            if filtro_persona and "Todos" not in filtro_persona:
-                data_filtrada = data_filtrada[data_filtrada['sugerido_por'].isin(filtro_persona)]
-            
-            # Aplicar ordenamiento
-            if orden == "Más recientes":
-                data_filtrada = data_filtrada.sort_values('fecha_sugerencia', ascending=False)
-            elif orden == "Más antiguas":
-                data_filtrada = data_filtrada.sort_values('fecha_sugerencia', ascending=True)
-            elif orden == "Más votadas":
-                if 'votos_count' in data_filtrada.columns:
-                    data_filtrada = data_filtrada.sort_values('votos_count', ascending=False)
-            elif orden == "Título":
-                data_filtrada = data_filtrada.sort_values('titulo_cancion', ascending=True)
-            
-            # Mostrar resultados
-            st.subheader(f"Mostrando {len(data_filtrada)} sugerencias")
-            
-            # Mostrar en tarjetas
-            num_cols = 3
-            cols = st.columns(num_cols)
-            
-            for i, (idx, row) in enumerate(data_filtrada.iterrows()):
-                col = cols[i % num_cols]
-                
-                with col:
-                    st.markdown("---")
-                    video_id = row['youtube_id']
-                    
-                    # Mostrar miniatura clicable
-                    st.markdown(f"[![Miniatura](https://img.youtube.com/vi/{video_id}/0.jpg)](https://www.youtube.com/watch?v={video_id})")
-                    
-                    # Información de la canción
-                    st.markdown(f"**{row['titulo_cancion']}**")
-                    st.markdown(f"Artista: {row['artista']}")
-                    st.markdown(f"Género: {row['genero']} | Dificultad: {row['dificultad']}")
-                    
-                    # Destacar quién sugirió la canción con estilo mejorado
-                    st.markdown(f"**👤 Sugerido por:** {row['sugerido_por']} ({row['fecha_sugerencia']})")
-                    
-                    # Sistema de votos
-                    votos = row.get('votos_count', 0)
-                    st.markdown(f"👍 **{votos}** me gusta")
-                    
-                    # Verificar si el usuario ya votó
-                    username = st.session_state.username
-                    already_voted = user_has_voted(video_id, username)
-                    
-                    # Botón para votar/quitar voto
-                    if already_voted:
-                        if st.button(f"Quitar me gusta 👎", key=f"vote_{video_id}"):
-                            if vote_song(video_id, username, False):
-                                st.rerun()
-                    else:
-                        if st.button(f"Me gusta 👍", key=f"vote_{video_id}"):
-                            if vote_song(video_id, username, True):
-                                st.rerun()
-                    
-                    if row['notas']:
-                        with st.expander("Notas"):
-                            st.write(row['notas'])
-                    
-                    # Botón para ver en YouTube
-                    st.markdown(f"[Ver en YouTube](https://www.youtube.com/watch?v={video_id})")
-    
-    # Pestaña 3: Estadísticas
-    with tab_selection[2]:
-        st.header("Estadísticas")
-        
-        data = load_data()
-        
-        if data.empty:
-            st.info("No hay datos suficientes para mostrar estadísticas.")
-        else:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Gráfico de canciones por género
-                st.subheader("Canciones por Género")
-                genero_counts = data['genero'].value_counts()
-                st.bar_chart(genero_counts)
-            
-            with col2:
-                # Gráfico de canciones por dificultad
-                st.subheader("Canciones por Dificultad")
-                dificultad_orden = {"Fácil": 1, "Intermedia": 2, "Difícil": 3, "Muy difícil": 4}
-                dificultad_counts = data['dificultad'].value_counts().sort_index(key=lambda x: x.map(dificultad_orden))
-                st.bar_chart(dificultad_counts)
-            
-            # Top canciones más votadas
-            if 'votos_count' in data.columns:
-                st.subheader("Top Canciones Más Populares")
-                top_songs = data.sort_values('votos_count', ascending=False)[['titulo_cancion', 'artista', 'votos_count']].head(5)
-                top_songs.columns = ['Canción', 'Artista', 'Votos']
-                st.table(top_songs)
-            
-            # Top contribuyentes
-            st.subheader("Top Contribuyentes")
-            contribuyentes = data['sugerido_por'].value_counts().reset_index()
-            contribuyentes.columns = ['Persona', 'Canciones Sugeridas']
-            st.table(contribuyentes.head(5))
-            
-            # Sugerencias recientes
-            st.subheader("Sugerencias Recientes")
-            recientes = data.sort_values('fecha_sugerencia', ascending=False)[['fecha_sugerencia', 'titulo_cancion', 'artista', 'sugerido_por']].head(5)
-            st.table(recientes)
-    
-    # Pestaña 4: Mi Cuenta
-    with tab_selection[3]:
-        st.header("Mi Cuenta")
-        
-        # Mostrar información del usuario
-        st.subheader("Información de Usuario")
-        st.write(f"**Usuario:** {st.session_state.username}")
-        st.write(f"**Nombre:** {st.session_state.user_info['nombre']}")
-        st.write(f"**Rol:** {st.session_state.user_info['rol']}")
-        
-        # Sección para cambiar contraseña
-        st.subheader("Cambiar Contraseña")
-        change_password_page()
-        
-        # Mostrar sugerencias del usuario
-        st.subheader("Mis Sugerencias")
-        
-        data = load_data()
-        user_suggestions = data[data['sugerido_por'] == st.session_state.user_info['nombre']]
-        
-        if user_suggestions.empty:
-            st.info("Aún no has sugerido ninguna canción.")
-        else:
-            st.write(f"Has sugerido {len(user_suggestions)} canciones.")
-            
-            # Mostrar lista de sugerencias del usuario
-            for _, row in user_suggestions.iterrows():
-                with st.expander(f"{row['titulo_cancion']} - {row['artista']}"):
-                    st.write(f"**Género:** {row['genero']}")
-                    st.write(f"**Dificultad:** {row['dificultad']}")
-                    st.write(f"**Fecha de sugerencia:** {row['fecha_sugerencia']}")
-                    if 'votos_count' in row:
-                        st.write(f"**Votos:** {row['votos_count']}")
-                    if row['notas']:
-                        st.write(f"**Notas:** {row['notas']}")
-                    st.markdown(f"[Ver en YouTube](https://www.youtube.com/watch?v={row['youtube_id']})")
-    
-    # Pestaña 5: Administración (solo para admins)
-    if st.session_state.user_info.get("rol") == "admin" and len(tab_selection) > 4:
-        with tab_selection[4]:
-            admin_page()
-
-# Verificar estado de inicio de sesión
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-
-# Mostrar la página correspondiente
-if st.session_state.logged_in:
-    main_app()
-else:
-    login_page()
-
-# Pie de página
-st.markdown("---")
-st.markdown("Desarrollado con ❤️ para nuestro grupo P27 | © 2025")
+import streamlit as st
+import pandas as pd
+import numpy as np
+import re
+import json
+import hashlib
+import heapq
+import html
+import atexit
+import base64
+import bisect
+import collections
+import copy
+import csv
+import concurrent.futures
+import requests
+import requests.adapters
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+import io
+import itertools
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+# pyarrow es opcional: sin él no se guarda la copia columnar (Parquet) de las canciones
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Configuración de la página
+st.set_page_config(page_title="Gestor de Sugerencias Musicales", page_icon="🎵", layout="wide")
+
+# Configuración del almacenamiento - "github" (por defecto) o "sqlite"
+def get_secret_section(name):
+    """Devuelve una sección de secrets.toml como diccionario (vacío si no existe)"""
+    try:
+        return dict(st.secrets.get(name, {}))
+    except Exception:
+        return {}
+
+STORAGE_CONFIG = get_secret_section("storage")
+STORAGE_BACKEND = STORAGE_CONFIG.get("backend", "github")
+
+if STORAGE_BACKEND not in ("github", "sqlite"):
+    st.error(f"Backend de almacenamiento desconocido: {STORAGE_BACKEND}")
+    st.stop()
+
+# Segundos que las vistas en cache se consideran frescas. Revalidar con GitHub es
+# barato: las peticiones condicionales que responden 304 no consumen límite de la API
+CACHE_TTL = 10
+
+# Cada cuántos segundos el hilo de sincronización busca cambios hechos desde otros procesos
+SYNC_SECONDS = STORAGE_CONFIG.get("sync_seconds", 10)
+
+# Carpeta local con la última copia buena de cada archivo y el journal de cambios sin publicar
+LOCAL_DIR = STORAGE_CONFIG.get("local_dir", ".sugerencias_local")
+
+def write_text_atomic(path, text):
+    """Escribe a un temporal y lo reemplaza: nunca queda un archivo local a medio escribir"""
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+# Metadatos de los videos (título, canal, duración): sección [youtube] de secrets.toml
+VIDEO_CONFIG = get_secret_section("youtube")
+
+# Configuración de GitHub - Estos valores deben estar en tu archivo secrets.toml
+if STORAGE_BACKEND == "github":
+    if 'github' not in st.secrets:
+        st.error("Se requiere configuración de GitHub en secrets.toml")
+        st.stop()
+
+    GITHUB_TOKEN = st.secrets["github"].get("token")
+    GITHUB_REPO = st.secrets["github"].get("repo")
+    GITHUB_OWNER = st.secrets["github"].get("owner")
+    GITHUB_BRANCH = st.secrets["github"].get("branch", "main")
+    GITHUB_API_URL = st.secrets["github"].get("api_url", "https://api.github.com")
+
+    # Verificar que los valores no estén vacíos
+    if not GITHUB_TOKEN or not GITHUB_REPO or not GITHUB_OWNER:
+        st.error("Configuración de GitHub incompleta en secrets.toml")
+        st.write("Por favor, verifica los siguientes valores:")
+        if not GITHUB_TOKEN:
+            st.write("- Token de GitHub")
+        if not GITHUB_REPO:
+            st.write("- Nombre del repositorio")
+        if not GITHUB_OWNER:
+            st.write("- Nombre del propietario")
+        st.stop()
+
+# Función para extraer el ID de YouTube de una URL
+def extract_youtube_id(url):
+    # Patrones comunes de URLs de YouTube
+    youtube_regex = (
+        r'(https?://)?(www\.)?'
+        '(youtube|youtu|youtube-nocookie)\.(com|be)/'
+        '(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})')
+    
+    youtube_regex_match = re.match(youtube_regex, url)
+    if youtube_regex_match:
+        return youtube_regex_match.group(6)
+    
+    # Para URLs acortadas (youtu.be)
+    if 'youtu.be' in url:
+        parsed_url = urlparse(url)
+        return parsed_url.path.lstrip('/')
+    
+    # Para URLs normales (youtube.com/watch?v=)
+    parsed_url = urlparse(url)
+    if parsed_url.hostname in ('youtu.be', 'www.youtu.be', 'youtube.com', 'www.youtube.com'):
+        if 'v' in parse_qs(parsed_url.query):
+            return parse_qs(parsed_url.query)['v'][0]
+    
+    return None
+
+# Metadatos de los videos
+def parse_iso_duration(value):
+    """Convierte una duración ISO 8601 de YouTube (p. ej. PT1H2M3S) a segundos"""
+    match = re.fullmatch(r'P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def format_duration(seconds):
+    """Duración como m:ss o h:mm:ss (cadena vacía si no se conoce)"""
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class YouTubeDataProvider:
+    """Proveedor de metadatos basado en videos.list de la API de datos de YouTube.
+
+    Cualquier servidor que responda el mismo formato en base_url sirve de
+    proveedor (p. ej. uno local con datos de prueba).
+    """
+
+    BATCH_SIZE = 50
+
+    def __init__(self, api_key, base_url="https://www.googleapis.com/youtube/v3", timeout=10):
+        self.session = requests.Session()
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(self, video_ids):
+        """Devuelve {id: info} de los videos que existen; lanza RequestException si falla"""
+        response = self.session.get(f"{self.base_url}/videos", timeout=self.timeout, params={
+            "part": "snippet,contentDetails", "id": ",".join(video_ids), "key": self.api_key,
+            "maxResults": len(video_ids)
+        })
+        response.raise_for_status()
+        videos = {}
+        for item in response.json().get("items", []):
+            snippet = item.get("snippet", {})
+            thumbnails = snippet.get("thumbnails", {})
+            thumbnail = (thumbnails.get("medium") or thumbnails.get("default") or {}).get("url")
+            videos[item["id"]] = {
+                "id": item["id"],
+                "title": snippet.get("title", ""),
+                "channel": snippet.get("channelTitle", ""),
+                "duration": parse_iso_duration(item.get("contentDetails", {}).get("duration")),
+                "thumbnail": thumbnail or f"https://img.youtube.com/vi/{item['id']}/mqdefault.jpg"
+            }
+        return videos
+
+class VideoMetadataCache:
+    """Metadatos de videos guardados en disco, compartidos por todas las sesiones.
+
+    Los videos que el proveedor no encontró se guardan como None (cache negativa)
+    durante negative_ttl segundos; los encontrados, durante ttl segundos.
+    """
+
+    def __init__(self, path, ttl, negative_ttl):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self._evict()
+
+    def lookup(self, video_ids):
+        """Devuelve ({id: info o None} de lo que está en cache, [ids que faltan o vencieron])"""
+        now = time.time()
+        found, missing = {}, []
+        with self.lock:
+            for video_id in video_ids:
+                entry = self.entries.get(video_id)
+                if entry is None or now - entry["at"] > self._ttl(entry):
+                    missing.append(video_id)
+                else:
+                    found[video_id] = entry["info"]
+        return found, missing
+
+    def store(self, video_ids, videos):
+        """Guarda el resultado de una consulta: los ids que no vinieron en videos no existen"""
+        now = time.time()
+        with self.lock:
+            for video_id in video_ids:
+                self.entries[video_id] = {"info": videos.get(video_id), "at": now}
+            self._evict()
+            write_text_atomic(self.path, json.dumps(self.entries, ensure_ascii=False))
+
+    def _ttl(self, entry):
+        return self.ttl if entry["info"] is not None else self.negative_ttl
+
+    def _evict(self):
+        now = time.time()
+        self.entries = {video_id: entry for video_id, entry in self.entries.items()
+                        if now - entry["at"] <= self._ttl(entry)}
+
+class VideoMetadataResolver:
+    """Resuelve metadatos de muchos videos a la vez: primero la cache en disco y
+    luego, para los que faltan, una petición al proveedor por cada lote de IDs.
+    """
+
+    def __init__(self, provider, cache, offline_seconds=60):
+        self.provider = provider
+        self.cache = cache
+        # Si el proveedor falla, no se vuelve a consultar durante offline_seconds
+        self.offline_seconds = offline_seconds
+        self.offline_until = 0
+        # Un solo hilo resuelve en segundo plano los videos que pide prefetch
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-metadata")
+        self.lock = threading.Lock()
+        self.queued = set()
+
+    def resolve(self, video_ids, fetch=True):
+        """Devuelve {id: info} para los videos conocidos e {id: None} para los que no existen.
+
+        Los videos sin datos (sin proveedor, sin conexión o fetch=False) no aparecen.
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        found, missing = self.cache.lookup(video_ids)
+        if not (missing and fetch and self.provider) or time.time() < self.offline_until:
+            return found
+        batch_size = self.provider.BATCH_SIZE
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(batches), 4)) as executor:
+            futures = {executor.submit(self.provider.fetch, batch): batch for batch in batches}
+            for future in concurrent.futures.as_completed(futures):
+                batch = futures[future]
+                try:
+                    videos = future.result()
+                except (requests.exceptions.RequestException, ValueError, KeyError):
+                    self.offline_until = time.time() + self.offline_seconds
+                    continue
+                self.cache.store(batch, videos)
+                found.update({video_id: videos.get(video_id) for video_id in batch})
+        return found
+
+    def prefetch(self, video_ids):
+        """Pide en segundo plano los videos que faltan en la cache, sin esperar la respuesta"""
+        if self.provider is None or time.time() < self.offline_until:
+            return
+        _, missing = self.cache.lookup(list(dict.fromkeys(video_ids)))
+        with self.lock:
+            missing = [video_id for video_id in missing if video_id not in self.queued]
+            self.queued.update(missing)
+        if missing:
+            self.executor.submit(self._prefetch, missing)
+
+    def _prefetch(self, video_ids):
+        try:
+            self.resolve(video_ids)
+        finally:
+            with self.lock:
+                self.queued.difference_update(video_ids)
+
+@st.cache_resource
+def get_video_resolver():
+    provider = None
+    if VIDEO_CONFIG.get("api_key"):
+        provider = YouTubeDataProvider(VIDEO_CONFIG["api_key"],
+                                       VIDEO_CONFIG.get("base_url", "https://www.googleapis.com/youtube/v3"))
+    cache = VideoMetadataCache(os.path.join(LOCAL_DIR, "videos.json"),
+                               ttl=VIDEO_CONFIG.get("cache_ttl", 7 * 24 * 3600),
+                               negative_ttl=VIDEO_CONFIG.get("negative_ttl", 24 * 3600))
+    return VideoMetadataResolver(provider, cache)
+
+def resolve_videos(video_ids, fetch=True):
+    """Metadatos de varios videos en una sola pasada (ver VideoMetadataResolver.resolve)"""
+    return get_video_resolver().resolve(video_ids, fetch)
+
+def prefetch_videos(video_ids):
+    """Completa la cache de metadatos en segundo plano (ver VideoMetadataResolver.prefetch)"""
+    get_video_resolver().prefetch(video_ids)
+
+# Función para obtener información básica del video
+def get_video_info(video_id, fetch=True):
+    """Metadatos de un video; None si el proveedor indica que no existe.
+
+    Si no hay datos disponibles, devuelve solo la miniatura (título None).
+    """
+    if not video_id or len(video_id) != 11:
+        return None
+    info = resolve_videos([video_id], fetch)
+    if video_id in info:
+        return info[video_id]
+    return {"id": video_id, "title": None, "channel": None, "duration": None,
+            "thumbnail": f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"}
+
+# Los hilos en segundo plano se marcan para poder esperar sin congelar la página
+_background_thread = threading.local()
+
+def mark_background_thread():
+    _background_thread.active = True
+
+def in_background_thread():
+    return getattr(_background_thread, "active", False)
+
+# Cliente HTTP compartido para todas las llamadas a GitHub
+class GitHubClient:
+    """Sesión persistente con GitHub, con reintentos y control del límite de la API.
+
+    Reintenta errores 5xx, 429 y fallos de conexión con espera exponencial con
+    jitter. En el hilo de la página las esperas no pasan de foreground_wait
+    segundos: si hace falta esperar más, o se agota el límite de la API, GitHub
+    se da por no disponible y se usan las copias locales. Solo los hilos en
+    segundo plano espacian las peticiones cuando X-RateLimit-Remaining baja del margen.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, token, pool_size=10, max_retries=4, timeout=10,
+                 backoff_base=0.5, backoff_max=20, rate_limit_reserve=50, rate_limit_max_wait=30,
+                 offline_seconds=30, foreground_wait=2):
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json"
+        })
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limit_reserve = rate_limit_reserve
+        self.rate_limit_max_wait = rate_limit_max_wait
+        self.rate_lock = threading.Lock()
+        self.rate_remaining = None
+        self.rate_reset = 0
+        # Tras agotar los reintentos, GitHub se da por caído durante offline_seconds
+        self.offline_seconds = offline_seconds
+        self.offline_until = 0
+        self.foreground_wait = foreground_wait
+
+    def available(self):
+        """False si la última petición agotó sus reintentos hace poco (modo sin conexión)"""
+        return time.time() >= self.offline_until
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        background = in_background_thread()
+        budget = math.inf if background else self.foreground_wait
+        for attempt in range(self.max_retries + 1):
+            if background:
+                self._wait_for_rate_limit()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                delay = self._backoff(attempt)
+                if attempt == self.max_retries or delay > budget:
+                    self.offline_until = time.time() + self.offline_seconds
+                    raise
+                time.sleep(delay)
+                budget -= delay
+                continue
+            self._update_rate_limit(response)
+            if not self._should_retry(response):
+                self.offline_until = 0
+                return response
+            if self.rate_limited(response):
+                # Con el límite alcanzado no sirve reintentar: copias locales hasta que GitHub
+                # vuelva a aceptar peticiones (Retry-After o renovación del límite)
+                self.offline_until = max(time.time() + self.offline_seconds, self._rate_limit_until(response))
+                return response
+            delay = self._retry_delay(response, attempt)
+            if attempt == self.max_retries or delay > budget:
+                self.offline_until = time.time() + self.offline_seconds
+                return response
+            time.sleep(delay)
+            budget -= delay
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+    def _should_retry(self, response):
+        if response.status_code in self.RETRY_STATUS:
+            return True
+        return self.rate_limited(response)
+
+    def rate_limited(self, response):
+        """Si GitHub limitó la petición: límite de la API agotado (X-RateLimit-Remaining: 0)
+        o límite secundario por ráfagas (Retry-After o el mensaje "secondary rate limit")"""
+        if response.status_code not in (403, 429):
+            return False
+        return (response.headers.get("X-RateLimit-Remaining") == "0"
+                or "Retry-After" in response.headers
+                or "secondary rate limit" in (response.text or "").lower())
+
+    def _rate_limit_until(self, response):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return time.time() + float(retry_after)
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            return self.rate_reset
+        return 0
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return self._backoff(attempt)
+
+    def _update_rate_limit(self, response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self.rate_lock:
+            self.rate_remaining = int(remaining)
+            self.rate_reset = int(reset)
+
+    def _wait_for_rate_limit(self):
+        with self.rate_lock:
+            remaining, reset = self.rate_remaining, self.rate_reset
+        if remaining is None or remaining >= self.rate_limit_reserve:
+            return
+        window = reset - time.time()
+        if window <= 0:
+            return
+        # Repartir las peticiones restantes hasta que se renueve el límite
+        time.sleep(min(window / max(remaining, 1), self.rate_limit_max_wait))
+
+@st.cache_resource
+def get_github_client():
+    return GitHubClient(GITHUB_TOKEN)
+
+def github_repo_url(path=""):
+    """URL de la API para un recurso del repositorio configurado"""
+    return f"{GITHUB_API_URL}/repos/{GITHUB_OWNER}/{GITHUB_REPO}{path}"
+
+# Cache de archivos de GitHub compartida por todas las sesiones del proceso
+class GitHubFileCache:
+    """Guarda por ruta el contenido, el SHA, el ETag y el objeto ya parseado de cada archivo.
+
+    Con directory, cada versión se guarda también en disco como última copia buena:
+    sirve para arrancar y leer sin conexión cuando GitHub no responde.
+    """
+
+    HISTORY_SIZE = 8
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.entries = {}
+        # Versiones recientes por ruta (SHA -> contenido), base de las fusiones de tres vías
+        self.history = {}
+        # Ruta -> (momento de la última comprobación con GitHub, si el archivo existía)
+        self.checked = {}
+        # Último listado de la raíz de la rama: {"etag", "shas": {ruta: sha}}
+        self.tree = None
+
+    def get(self, file_path):
+        with self.lock:
+            if file_path not in self.entries and self.directory:
+                snapshot = self._load_snapshot(file_path)
+                if snapshot:
+                    self.entries[file_path] = dict(snapshot, parsed=None)
+            return self.entries.get(file_path)
+
+    def store(self, file_path, content, sha, etag=None):
+        with self.lock:
+            self.entries[file_path] = {"content": content, "sha": sha, "etag": etag, "parsed": None}
+            self.checked[file_path] = (time.monotonic(), True)
+            if self.directory:
+                self._save_snapshot(file_path, {"content": content, "sha": sha, "etag": etag})
+            versions = self.history.setdefault(file_path, {})
+            versions[sha] = content
+            while len(versions) > self.HISTORY_SIZE:
+                del versions[next(iter(versions))]
+
+    def remove(self, file_path):
+        """Olvida un archivo que ya no existe en GitHub"""
+        with self.lock:
+            self.entries.pop(file_path, None)
+            self.checked[file_path] = (time.monotonic(), False)
+            if self.directory:
+                try:
+                    os.remove(self._snapshot_path(file_path))
+                except OSError:
+                    pass
+                self._remove_columnar(file_path)
+
+    def mark_checked(self, file_path, exists):
+        with self.lock:
+            self.checked[file_path] = (time.monotonic(), exists)
+
+    def checked_within(self, file_path, max_age):
+        """Si el archivo existía en una comprobación de hace menos de max_age segundos (None si no hubo)"""
+        with self.lock:
+            checked_at, exists = self.checked.get(file_path, (None, None))
+        if checked_at is None or time.monotonic() - checked_at > max_age:
+            return None
+        return exists
+
+    def _snapshot_path(self, file_path):
+        return os.path.join(self.directory, file_path.replace("/", "__") + ".json")
+
+    def _load_snapshot(self, file_path):
+        try:
+            with open(self._snapshot_path(file_path), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_snapshot(self, file_path, snapshot):
+        write_text_atomic(self._snapshot_path(file_path), json.dumps(snapshot, ensure_ascii=False))
+
+    def content_at(self, file_path, sha):
+        """Contenido de una versión anterior del archivo, si todavía está en memoria"""
+        with self.lock:
+            return self.history.get(file_path, {}).get(sha)
+
+    def parsed(self, file_path, parser):
+        """Devuelve una copia del objeto parseado, parseando solo una vez por versión"""
+        entry = self.get(file_path)
+        if entry is None or not entry["content"]:
+            return None
+        if entry["parsed"] is None:
+            entry["parsed"] = self._load_columnar(file_path, entry["sha"])
+        if entry["parsed"] is None:
+            entry["parsed"] = parser(entry["content"])
+            self._save_columnar(file_path, entry["sha"], entry["parsed"])
+        return copy.deepcopy(entry["parsed"])
+
+    # Las tablas ya parseadas (con sus tipos) se guardan también en Parquet junto a la
+    # copia local: al arrancar se leen columnas tipadas en vez de volver a parsear el CSV
+    def _columnar_path(self, file_path, sha):
+        return os.path.join(self.directory, f"{file_path.replace('/', '__')}.{sha}.parquet")
+
+    def _load_columnar(self, file_path, sha):
+        if not (self.directory and pyarrow and sha):
+            return None
+        try:
+            return pd.read_parquet(self._columnar_path(file_path, sha))
+        except (OSError, ValueError):
+            return None
+
+    def _save_columnar(self, file_path, sha, parsed):
+        if not (self.directory and pyarrow and sha and isinstance(parsed, pd.DataFrame)):
+            return
+        path = self._columnar_path(file_path, sha)
+        try:
+            parsed.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+            # Solo se conserva la versión actual
+            self._remove_columnar(file_path, keep=os.path.basename(path))
+        except (OSError, ValueError):
+            pass
+
+    def _remove_columnar(self, file_path, keep=None):
+        """Borra las copias Parquet de file_path salvo keep"""
+        prefix = file_path.replace('/', '__') + "."
+        try:
+            for name in os.listdir(self.directory):
+                if name.startswith(prefix) and name.endswith(".parquet") and name != keep:
+                    os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+@st.cache_resource
+def get_github_file_cache():
+    return GitHubFileCache(os.path.join(LOCAL_DIR, "archivos"))
+
+# Funciones para manejar GitHub como almacenamiento
+def fetch_github_file(file_path):
+    """Descarga un archivo de GitHub sin mostrar mensajes; devuelve (respuesta, contenido, sha).
+
+    Usa peticiones condicionales (If-None-Match): si el archivo no cambió, GitHub
+    responde 304, se reutiliza la copia en cache y no se consume límite de la API.
+    """
+    url = github_repo_url(f"/contents/{file_path}")
+    headers = {}
+    params = {"ref": GITHUB_BRANCH}
+    
+    file_cache = get_github_file_cache()
+    cached = file_cache.get(file_path)
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    
+    response = get_github_client().get(url, headers=headers, params=params)
+    
+    if response.status_code == 304:
+        file_cache.mark_checked(file_path, True)
+        return response, cached["content"], cached["sha"]
+    elif response.status_code == 200:
+        content = response.json()
+        if content.get("encoding") == "none":
+            # Archivos de más de 1 MB: la API de contenidos no incluye el contenido
+            file_content = fetch_github_blob(content["sha"])
+        else:
+            file_content = base64.b64decode(content["content"]).decode("utf-8")
+        file_cache.store(file_path, file_content, content["sha"], response.headers.get("ETag"))
+        return response, file_content, content["sha"]
+    elif response.status_code == 404:
+        file_cache.remove(file_path)
+    return response, None, None
+
+def fetch_github_blob(sha):
+    """Contenido de un blob por su SHA (sin el límite de 1 MB de la API de contenidos)"""
+    response = get_github_client().get(github_repo_url(f"/git/blobs/{sha}"),
+                                       headers={"Accept": "application/vnd.github.raw"})
+    response.raise_for_status()
+    return response.content.decode("utf-8")
+
+def get_github_blobs(files):
+    """Pone en la cache los archivos {ruta: sha del blob} que no estén ya en esa versión.
+
+    Los blobs no cambian para un SHA dado, así que solo se descargan, en paralelo,
+    los que faltan. Devuelve {ruta: error} de los que no se pudieron descargar
+    (sin conexión, todos los que faltan); de esos sigue en la cache la versión anterior, si la hay.
+    """
+    file_cache = get_github_file_cache()
+    missing = {path: sha for path, sha in files.items() if (file_cache.get(path) or {}).get("sha") != sha}
+    if not missing:
+        return {}
+    if not get_github_client().available():
+        return {path: "sin conexión con GitHub" for path in missing}
+    
+    def fetch(path, sha):
+        file_cache.store(path, fetch_github_blob(sha), sha)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(missing), 8)) as executor:
+        futures = {path: executor.submit(fetch, path, sha) for path, sha in missing.items()}
+    return {path: str(future.exception()) for path, future in futures.items() if future.exception()}
+
+def get_github_file(file_path, missing_ok=False, max_age=0, strict=False):
+    """Obtiene el contenido de un archivo desde GitHub.
+
+    Con max_age, una copia comprobada hace menos de max_age segundos se devuelve
+    sin consultar GitHub (p. ej. la que acaba de traer prefetch_github_files).
+    Con strict (para escribir), (None, None) significa que GitHub respondió 404;
+    cualquier otro fallo lanza GitHubReadError en vez de usar la copia local.
+    """
+    file_cache = get_github_file_cache()
+    exists = file_cache.checked_within(file_path, max_age) if max_age else None
+    if exists is not None:
+        cached = file_cache.get(file_path)
+        return (cached["content"], cached["sha"]) if exists and cached else (None, None)
+    
+    # Sin conexión: servir la última copia buena sin esperar a que GitHub falle otra vez
+    cached = file_cache.get(file_path)
+    if not get_github_client().available():
+        if strict:
+            raise GitHubReadError(f"GitHub no está disponible para leer {file_path}")
+        return (cached["content"], cached["sha"]) if cached else (None, None)
+    
+    try:
+        response, file_content, sha = fetch_github_file(file_path)
+        
+        if response.status_code in (200, 304):
+            return file_content, sha
+        elif response.status_code == 404:
+            # El archivo no existe
+            if not missing_ok:
+                st.info(f"El archivo {file_path} no existe en el repositorio. Se creará uno nuevo.")
+            return None, None
+        elif strict:
+            raise GitHubReadError(f"No se pudo leer {file_path}: {response.status_code}")
+        elif cached:
+            return cached["content"], cached["sha"]
+        else:
+            st.error(f"Error al obtener archivo de GitHub: {response.status_code} - {response.text}")
+            return None, None
+    except GitHubReadError:
+        raise
+    except requests.exceptions.Timeout as e:
+        if strict:
+            raise GitHubReadError(f"Tiempo de espera agotado al leer {file_path}") from e
+        if cached:
+            return cached["content"], cached["sha"]
+        st.error("Tiempo de espera agotado al conectar con GitHub. Verifica tu conexión a internet.")
+        return None, None
+    except Exception as e:
+        if strict:
+            raise GitHubReadError(f"No se pudo leer {file_path}: {e}") from e
+        if cached:
+            return cached["content"], cached["sha"]
+        st.error(f"Error inesperado al obtener archivo de GitHub: {str(e)}")
+        return None, None
+
+def get_github_tree_shas():
+    """SHA de cada archivo de la raíz de la rama, con una sola petición (None si falla)"""
+    file_cache = get_github_file_cache()
+    cached = file_cache.tree
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    response = get_github_client().get(github_repo_url(f"/git/trees/{GITHUB_BRANCH}"), headers=headers)
+    if response.status_code == 304:
+        return cached["shas"]
+    if response.status_code != 200:
+        return None
+    shas = {entry["path"]: entry["sha"] for entry in response.json()["tree"] if entry["type"] == "blob"}
+    if response.headers.get("ETag"):
+        file_cache.tree = {"etag": response.headers["ETag"], "shas": shas}
+    return shas
+
+def prefetch_github_files(file_paths, max_age=0):
+    """Pone al día en la cache los archivos que no se comprobaron hace menos de max_age segundos.
+
+    Primero compara los SHA del árbol de la rama con los de la cache (una petición)
+    y solo descarga, en paralelo, los archivos que cambiaron. Los fallos no se
+    muestran aquí: ese archivo queda sin comprobar y su lectura normal lo vuelve
+    a pedir y muestra el error.
+    """
+    file_cache = get_github_file_cache()
+    pending = [path for path in file_paths if file_cache.checked_within(path, max_age) is None]
+    if not pending or not get_github_client().available():
+        return
+    try:
+        tree = get_github_tree_shas()
+    except Exception:
+        tree = None
+    if tree is not None:
+        changed = []
+        for path in pending:
+            cached = file_cache.get(path)
+            if "/" in path:
+                # El listado solo cubre la raíz de la rama
+                changed.append(path)
+            elif path not in tree:
+                file_cache.mark_checked(path, False)
+            elif cached and cached["sha"] == tree[path]:
+                file_cache.mark_checked(path, True)
+            else:
+                changed.append(path)
+        pending = changed
+    if not pending:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as executor:
+        futures = [executor.submit(fetch_github_file, path) for path in pending]
+        concurrent.futures.wait(futures)
+
+def get_github_parsed(file_path, parser, missing_ok=False, max_age=0, strict=False):
+    """Obtiene un archivo de GitHub ya parseado, reutilizando el objeto si no cambió.
+
+    Un archivo vacío devuelve None como objeto pero conserva su SHA.
+    """
+    content, sha = get_github_file(file_path, missing_ok, max_age, strict)
+    if content is None:
+        return None, None
+    return get_github_file_cache().parsed(file_path, parser), sha
+
+class GitHubConflictError(Exception):
+    """El archivo o la rama cambiaron en GitHub desde que se leyeron"""
+
+class GitHubReadError(Exception):
+    """No se pudo leer la versión actual de un archivo (un fallo distinto de 404)"""
+
+class GitHubRejectedError(Exception):
+    """GitHub rechazó el cambio (un error 4xx que no es un conflicto): reintentarlo no sirve"""
+
+def is_rejection(response):
+    """Si la respuesta es un rechazo definitivo y no un fallo pasajero o el límite de la API"""
+    return 400 <= response.status_code < 500 and response.status_code != 429 \
+        and not get_github_client().rate_limited(response)
+
+def update_github_file(file_path, content, sha=None, commit_message=None):
+    """Actualiza o crea un archivo en GitHub.
+
+    sha es la versión que se leyó; None significa que el archivo no debe existir.
+    Lanza GitHubConflictError si el SHA ya no corresponde a la versión actual.
+    """
+    url = github_repo_url(f"/contents/{file_path}")
+    client = get_github_client()
+    
+    if not commit_message:
+        commit_message = f"Actualización automática de {file_path}"
+    
+    data = {
+        "message": commit_message,
+        "content": base64.b64encode(content.encode("utf-8")).decode("utf-8"),
+        "branch": GITHUB_BRANCH
+    }
+    
+    # Sin SHA, GitHub solo crea el archivo: si otro proceso ya lo creó responde 422
+    if sha is not None:
+        data["sha"] = sha
+    
+    try:
+        response = client.put(url, json=data)
+        
+        if response.status_code in [200, 201]:
+            # Mantener la cache compartida al día con lo que acabamos de escribir
+            get_github_file_cache().store(file_path, content, response.json()["content"]["sha"])
+            return True
+        elif response.status_code == 409 or (response.status_code == 422 and "sha" in response.text):
+            raise GitHubConflictError(f"El archivo {file_path} cambió en GitHub desde la última lectura")
+        else:
+            details = {}
+            try:
+                details = response.json()
+            except:
+                details = {"text": response.text}
+            
+            error_msg = f"Error al actualizar archivo en GitHub: {response.status_code}"
+            if details:
+                error_msg += f"\nDetalles: {details}"
+            
+            if is_rejection(response):
+                raise GitHubRejectedError(error_msg)
+            if not client.rate_limited(response):
+                st.error(error_msg)
+            # Fallo pasajero: el cambio sigue en el journal y se reintenta después
+            return False
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error de conexión: {e}")
+        return False
+
+def git_blob_sha(content):
+    """SHA que GitHub asigna a un archivo con este contenido"""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class GitHubCommit:
+    """Agrupa cambios en varios archivos y los publica como un único commit.
+
+    Con un solo archivo usa la API de contenidos (una petición); con varios usa la
+    API de Git Data (árbol, commit y una sola actualización de la rama), de modo que
+    los archivos nunca quedan a medio actualizar.
+    """
+
+    def __init__(self, message=None):
+        self.message = message
+        self.changes = {}
+
+    def stage(self, file_path, content, expected_sha=None):
+        """Prepara un archivo (content None lo borra).
+
+        El commit falla si el archivo ya no está en expected_sha; con None, si el archivo existe.
+        """
+        self.changes[file_path] = (content, expected_sha)
+
+    def push(self):
+        """Publica el commit. Lanza GitHubConflictError si otro proceso escribió antes"""
+        if not self.changes:
+            return True
+        if len(self.changes) == 1 and next(iter(self.changes.values()))[0] is not None:
+            (file_path, (content, sha)), = self.changes.items()
+            return update_github_file(file_path, content, sha, self.message)
+        
+        message = self.message or f"Actualización automática de {', '.join(self.changes)}"
+        client = get_github_client()
+        try:
+            response = client.get(github_repo_url(f"/git/ref/heads/{GITHUB_BRANCH}"))
+            response.raise_for_status()
+            head_sha = response.json()["object"]["sha"]
+            
+            response = client.get(github_repo_url(f"/git/trees/{head_sha}"), params={"recursive": 1})
+            response.raise_for_status()
+            base_tree = response.json()
+            current_shas = {entry["path"]: entry["sha"] for entry in base_tree["tree"]}
+            for file_path, (_, expected_sha) in self.changes.items():
+                if current_shas.get(file_path) != expected_sha:
+                    raise GitHubConflictError(f"El archivo {file_path} cambió en GitHub desde la última lectura")
+            
+            response = client.post(github_repo_url("/git/trees"), json={
+                "base_tree": base_tree["sha"],
+                "tree": [
+                    {"path": file_path, "mode": "100644", "type": "blob", "content": content}
+                    if content is not None else
+                    {"path": file_path, "mode": "100644", "type": "blob", "sha": None}
+                    for file_path, (content, _) in self.changes.items()
+                ]
+            })
+            response.raise_for_status()
+            
+            response = client.post(github_repo_url("/git/commits"), json={
+                "message": message,
+                "tree": response.json()["sha"],
+                "parents": [head_sha]
+            })
+            response.raise_for_status()
+            
+            # Solo avanza si nadie más movió la rama entretanto (sin force)
+            response = client.patch(github_repo_url(f"/git/refs/heads/{GITHUB_BRANCH}"),
+                                    json={"sha": response.json()["sha"], "force": False})
+            if response.status_code == 422:
+                raise GitHubConflictError("La rama cambió en GitHub mientras se guardaban los datos")
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            if is_rejection(e.response):
+                raise GitHubRejectedError(f"Error al crear el commit en GitHub: {e}") from e
+            if not client.rate_limited(e.response):
+                st.error(f"Error al crear el commit en GitHub: {e}")
+            return False
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error al crear el commit en GitHub: {e}")
+            return False
+        
+        # Mantener la cache compartida al día con lo que acabamos de escribir
+        file_cache = get_github_file_cache()
+        for file_path, (content, _) in self.changes.items():
+            if content is None:
+                file_cache.remove(file_path)
+            else:
+                file_cache.store(file_path, content, git_blob_sha(content))
+        return True
+
+# Estado de la conexión con GitHub, comprobado en segundo plano una vez por proceso
+class GitHubHealthCheck:
+    """Comprueba periódicamente el acceso al repositorio sin bloquear el renderizado"""
+
+    def __init__(self, client, url, interval=60):
+        self.client = client
+        self.url = url
+        self.interval = interval
+        self.ok = None  # None mientras la primera comprobación está pendiente
+        self.error = None
+        self.checked_at = None
+        threading.Thread(target=self._run, name="github-health-check", daemon=True).start()
+
+    def _run(self):
+        mark_background_thread()
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+    def check(self):
+        try:
+            response = self.client.get(self.url)
+            response.raise_for_status()
+            self.ok, self.error = True, None
+        except Exception as e:
+            self.ok, self.error = False, str(e)
+        self.checked_at = datetime.now()
+
+@st.cache_resource
+def get_github_health_check():
+    return GitHubHealthCheck(get_github_client(), github_repo_url())
+
+def show_github_status():
+    """Indicador de la conexión con GitHub según la última comprobación en segundo plano"""
+    health = get_github_health_check()
+    if not get_github_client().available():
+        st.warning("Sin conexión con GitHub: se muestran los últimos datos guardados en este equipo "
+                   "y los cambios se publicarán cuando vuelva la conexión.")
+    elif health.ok is None:
+        st.caption("🟡 Comprobando conexión con GitHub...")
+    elif health.ok:
+        st.caption(f"🟢 Conectado a GitHub (comprobado a las {health.checked_at:%H:%M:%S})")
+    else:
+        st.warning(f"Error al conectar con GitHub: {health.error}. "
+                   "Por favor, verifica la configuración en secrets.toml")
+
+if STORAGE_BACKEND == "github":
+    show_github_status()
+
+# Capa de almacenamiento: todas las lecturas y escrituras pasan por un backend
+SONG_COLUMNS = ['youtube_id', 'url', 'titulo_cancion', 'artista', 'genero', 'dificultad',
+                'sugerido_por', 'fecha_sugerencia', 'notas', 'votos_count']
+
+# Tipos de la tabla de canciones: categorías para las columnas con pocos valores
+# distintos, fecha real para fecha_sugerencia y texto (nunca NaN) para el resto
+SONG_TEXT_COLUMNS = ['youtube_id', 'url', 'titulo_cancion', 'artista', 'notas']
+SONG_CATEGORY_COLUMNS = ['genero', 'dificultad', 'sugerido_por']
+DIFFICULTY_LEVELS = ["Fácil", "Intermedia", "Difícil", "Muy difícil"]
+GENRE_OPTIONS = ["Rock", "Pop", "Metal", "Jazz", "Electrónica", "Folk", "Otro"]
+DATE_FORMAT = '%Y-%m-%d'
+
+def apply_song_schema(df):
+    """Convierte una tabla de canciones leída como texto a sus tipos"""
+    df = df.copy()
+    for column in SONG_TEXT_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].fillna("").astype(str)
+    for column in SONG_CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    if 'dificultad' in df.columns:
+        # Niveles conocidos en orden de dificultad, seguidos de cualquier otro valor
+        extra = sorted(set(df['dificultad'].dropna()) - set(DIFFICULTY_LEVELS))
+        df['dificultad'] = df['dificultad'].astype(pd.CategoricalDtype(DIFFICULTY_LEVELS + extra, ordered=True))
+    if 'fecha_sugerencia' in df.columns:
+        df['fecha_sugerencia'] = pd.to_datetime(df['fecha_sugerencia'], errors='coerce', format='mixed')
+    if 'votos_count' in df.columns:
+        df['votos_count'] = pd.to_numeric(df['votos_count'], errors='coerce').fillna(0).astype(int)
+    return df
+
+def format_date(value):
+    """Fecha como AAAA-MM-DD para mostrar o exportar (vacía si no hay fecha)"""
+    return pd.Timestamp(value).strftime(DATE_FORMAT) if pd.notna(value) else ""
+
+# Función auxiliar para crear un DataFrame vacío con la estructura correcta
+def create_empty_songs_dataframe():
+    return apply_song_schema(pd.DataFrame({column: [] for column in SONG_COLUMNS}))
+
+class StorageBackend:
+    """Interfaz común de almacenamiento para usuarios, canciones y votos"""
+
+    def read_users(self):
+        raise NotImplementedError
+
+    def write_users(self, users, message=None):
+        raise NotImplementedError
+
+    def read_songs(self):
+        raise NotImplementedError
+
+    def write_songs(self, df, message=None):
+        raise NotImplementedError
+
+    def read_votes(self):
+        raise NotImplementedError
+
+    def write_votes(self, votes, message=None):
+        raise NotImplementedError
+
+    def write_batch(self, users=None, songs=None, votes=None, message=None):
+        """Guarda varios recursos a la vez; cada backend lo hace de forma atómica si puede"""
+        ok = True
+        if users is not None:
+            ok = self.write_users(users, message) and ok
+        if songs is not None:
+            ok = self.write_songs(songs, message) and ok
+        if votes is not None:
+            ok = self.write_votes(votes, message) and ok
+        return ok
+
+    def record_votes(self, changes):
+        """Guarda de forma duradera votos aceptados que aún no se publicaron (si hace falta)"""
+
+    def publish_votes(self, changes, message=None):
+        """Publica votos ya aceptados con record_votes"""
+        return self.apply_votes(changes, message)
+
+    def rejected_changes(self):
+        """Cambios que el almacenamiento rechazó y esperan a que un administrador decida"""
+        return []
+
+    def resolve_rejected_change(self, entry_id, retry):
+        """Reintenta (retry) o descarta un cambio rechazado"""
+
+    def apply_votes(self, changes, message=None):
+        """Aplica una lista de votos (youtube_id, username, valor)"""
+        votes = self.read_votes() or {}
+        for youtube_id, username, value in changes:
+            votes.setdefault(youtube_id, {})[username] = value
+        return self.write_votes(votes, message)
+
+    def add_songs(self, rows):
+        """Agrega una lista de canciones (diccionarios con las columnas de SONG_COLUMNS)"""
+        df = self.read_songs()
+        if df is None:
+            df = create_empty_songs_dataframe()
+        df = pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+        return self.write_songs(df)
+
+    def prefetch(self):
+        """Precarga usuarios, canciones y votos de una vez; por defecto no hace nada"""
+
+    def change_token(self):
+        """Valor que cambia cada vez que cambian los datos guardados (None si no se sabe)"""
+        return None
+
+    def replay_journal(self):
+        """Publica las escrituras pendientes, si el backend las guarda localmente"""
+        return True
+
+    def set_user(self, username, info):
+        """Crea o actualiza un único usuario"""
+        users = self.read_users() or {}
+        users[username] = info
+        return self.write_users(users)
+
+def parse_songs_csv(content):
+    return apply_song_schema(pd.read_csv(io.StringIO(content), dtype=str, keep_default_na=False))
+
+def song_months(fechas):
+    """Mes (AAAA-MM) de cada fecha de sugerencia: la partición donde se guarda la canción"""
+    fechas = pd.to_datetime(pd.Series(fechas, dtype=object), errors='coerce', format='mixed')
+    return fechas.dt.strftime('%Y-%m').fillna('sin-fecha').tolist()
+
+def split_songs_by_month(df):
+    """{mes: canciones de ese mes}"""
+    months = np.array(song_months(df['fecha_sugerencia']), dtype=object)
+    return {month: shard for month, shard in df.groupby(months, sort=True)}
+
+def serialize_songs_csv(df):
+    """CSV de canciones, el formato de intercambio en GitHub; fechas como AAAA-MM-DD"""
+    fechas = pd.to_datetime(df['fecha_sugerencia'], errors='coerce', format='mixed')
+    return df.assign(
+        fecha_sugerencia=fechas.dt.strftime(DATE_FORMAT).where(fechas.notna(), df['fecha_sugerencia'].astype(object))
+    ).to_csv(index=False)
+
+def three_way_merge(base, ours, theirs):
+    """Fusiona dos versiones de un diccionario de registros a partir de su versión común.
+
+    Se parte de la versión remota (theirs) y se aplican los registros que nosotros
+    agregamos o modificamos respecto a la base. Los borrados remotos se respetan.
+    """
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if key not in base or base[key] != value:
+            merged[key] = value
+    return merged
+
+def merge_users(base, ours, theirs):
+    return three_way_merge(base or {}, ours, theirs or {})
+
+def parse_vote_log(content):
+    """Eventos de voto (uno por línea JSON) en el orden en que se registraron"""
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+def serialize_vote_log(events):
+    return "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+
+def make_vote_events(changes):
+    timestamp = datetime.now().isoformat(timespec="seconds")
+    return [
+        {"ts": timestamp, "youtube_id": youtube_id, "username": username, "valor": bool(value)}
+        for youtube_id, username, value in changes
+    ]
+
+def replay_vote_log(votes, events):
+    """Aplica los eventos del registro sobre una instantánea de votos"""
+    for event in events:
+        votes.setdefault(event["youtube_id"], {})[event["username"]] = event["valor"]
+    return votes
+
+def merge_songs(base, ours, theirs):
+    def by_youtube_id(df):
+        if df is None:
+            return {}
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        return {record['youtube_id']: record for record in records}
+    merged = three_way_merge(by_youtube_id(base), by_youtube_id(ours), by_youtube_id(theirs))
+    return pd.DataFrame(list(merged.values()), columns=ours.columns)
+
+class WriteAheadJournal:
+    """Registro en disco (una línea JSON por cambio) de las escrituras pendientes de publicar.
+
+    Cada cambio se guarda aquí antes de intentar publicarlo y se borra cuando ya
+    está en GitHub; así ninguna escritura se pierde si GitHub no responde.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.replay_lock = threading.Lock()
+        self.entries = []
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+            for number, line in enumerate(lines, start=1):
+                try:
+                    self.entries.append(json.loads(line))
+                except ValueError:
+                    # Una caída durante append puede dejar la última línea a medias
+                    st.warning(f"Se descartó la línea {number} del journal ({path}): estaba incompleta o dañada.")
+            if len(self.entries) != len(lines):
+                self._rewrite()
+        self.next_id = max((entry["id"] for entry in self.entries), default=0) + 1
+
+    def append(self, op, args):
+        with self.lock:
+            entry = {"id": self.next_id, "ts": datetime.now().isoformat(timespec="seconds"),
+                     "op": op, "args": args}
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries.append(entry)
+            self.next_id += 1
+            return entry
+
+    def pending(self, op=None):
+        """Cambios por publicar (sin los que GitHub rechazó)"""
+        with self.lock:
+            return [entry for entry in self.entries
+                    if "error" not in entry and (op is None or entry["op"] == op)]
+
+    def rejected(self):
+        """Cambios apartados porque GitHub los rechazó; esperan a que un administrador decida"""
+        with self.lock:
+            return [entry for entry in self.entries if "error" in entry]
+
+    def get(self, entry_id):
+        with self.lock:
+            return next((entry for entry in self.entries if entry["id"] == entry_id), None)
+
+    def remove(self, *entry_ids):
+        with self.lock:
+            self.entries = [entry for entry in self.entries if entry["id"] not in entry_ids]
+            self._rewrite()
+
+    def reject(self, entry_ids, error):
+        """Aparta los cambios para que no bloqueen a los siguientes"""
+        with self.lock:
+            for entry in self.entries:
+                if entry["id"] in entry_ids:
+                    entry["error"] = error
+            self._rewrite()
+
+    def retry(self, entry_id):
+        """Vuelve a poner en la cola un cambio rechazado"""
+        with self.lock:
+            for entry in self.entries:
+                if entry["id"] == entry_id:
+                    entry.pop("error", None)
+            self._rewrite()
+
+    def _rewrite(self):
+        write_text_atomic(self.path, "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in self.entries))
+
+class GitHubStorage(StorageBackend):
+    """Backend que guarda cada recurso como un archivo del repositorio de GitHub"""
+
+    USERS_FILE = 'usuarios.json'
+    SONGS_FILE = 'canciones_sugeridas.csv'
+    # Los votos se guardan como una instantánea más un registro de eventos que solo crece;
+    # al compactar, el registro se pliega en la instantánea y se archiva en VOTES_HISTORY_DIR
+    VOTES_FILE = 'votos.json'
+    VOTES_LOG_FILE = 'votos_log.jsonl'
+    VOTES_HISTORY_DIR = 'historial_votos'
+    # Las canciones se guardan en un CSV por mes de sugerencia (SONGS_SHARD_DIR/AAAA-MM.csv)
+    # y un manifiesto en la raíz con el SHA y el número de filas de cada partición. Así
+    # ninguna lectura ni escritura pasa por un único archivo que crece sin límite.
+    # SONGS_FILE es el formato anterior: se reparte en particiones en la primera escritura
+    SONGS_MANIFEST_FILE = 'canciones_manifest.json'
+    SONGS_SHARD_DIR = 'canciones'
+
+    # Por archivo: cómo se parsea y cómo se serializa
+    FILE_FORMATS = {
+        USERS_FILE: (json.loads, lambda users: json.dumps(users, indent=2)),
+        SONGS_FILE: (parse_songs_csv, serialize_songs_csv),
+        VOTES_FILE: (json.loads, lambda votes: json.dumps(votes, separators=(",", ":"))),
+        VOTES_LOG_FILE: (parse_vote_log, serialize_vote_log),
+        SONGS_MANIFEST_FILE: (json.loads, lambda manifest: json.dumps(manifest, indent=2, sort_keys=True)),
+    }
+    SONG_SHARD_FORMAT = (parse_songs_csv, serialize_songs_csv)
+
+    MAX_COMMIT_ATTEMPTS = 4
+
+    def __init__(self, compact_after=100, fresh_seconds=5, journal=None):
+        self.compact_after = compact_after
+        # Segundos en que una lectura reutiliza la copia recién comprobada sin volver a preguntar
+        self.fresh_seconds = fresh_seconds
+        # Cambios aceptados que todavía no están en GitHub (WriteAheadJournal)
+        self.journal = journal
+
+    def prefetch(self):
+        """Pone al día usuarios, canciones y votos: una petición para saber qué cambió
+        y las descargas necesarias en paralelo"""
+        prefetch_github_files(list(self.FILE_FORMATS), self.fresh_seconds)
+
+    def change_token(self):
+        """SHA de cada archivo en GitHub; cambia cuando alguien modifica los datos"""
+        prefetch_github_files(list(self.FILE_FORMATS))
+        file_cache = get_github_file_cache()
+        return tuple(
+            (file_cache.get(path) or {}).get("sha") if file_cache.checked_within(path, math.inf) else None
+            for path in self.FILE_FORMATS
+        )
+
+    def read_users(self):
+        self.prefetch()
+        users, sha = get_github_parsed(self.USERS_FILE, json.loads, max_age=self.fresh_seconds)
+        # Los cambios que siguen en el journal se ven aunque aún no estén en GitHub
+        for entry in self._pending("set_user"):
+            username, info = entry["args"]
+            users = users or {}
+            users[username] = info
+        if not users:
+            return None
+        # Guardar el SHA para futuras actualizaciones
+        st.session_state['users_sha'] = sha
+        return users
+
+    def write_users(self, users, message=None):
+        return self.write_batch(users=users, message=message)
+
+    def set_user(self, username, info):
+        return self._write_ahead("set_user", username, info)
+
+    def _set_user(self, username, info):
+        def mutate(users):
+            users = users or {}
+            users[username] = info
+            return users
+        return self._update_file(self.USERS_FILE, mutate)
+
+    def _file_format(self, file_path):
+        if file_path.startswith(self.SONGS_SHARD_DIR + "/"):
+            return self.SONG_SHARD_FORMAT
+        return self.FILE_FORMATS[file_path]
+
+    def _shard_path(self, month):
+        return f"{self.SONGS_SHARD_DIR}/{month}.csv"
+
+    def _read_song_shards(self, manifest):
+        """Todas las canciones de las particiones del manifiesto.
+
+        Solo se descargan las particiones cuyo SHA no está ya en la cache; cada una
+        se parsea una vez por versión.
+        """
+        shards = manifest.get("shards", {})
+        failed = get_github_blobs({info["path"]: info["sha"] for info in shards.values()})
+        file_cache = get_github_file_cache()
+        frames, lost = [], []
+        for _, info in sorted(shards.items()):
+            path = info["path"]
+            if path in failed and file_cache.get(path) is None:
+                # Sin blob ni copia local: intentar por la API de contenidos antes de darla por perdida
+                get_github_file(path, missing_ok=True)
+            frame = file_cache.parsed(path, parse_songs_csv)
+            if frame is None and info.get("rows"):
+                lost.append(f"{path} ({failed.get(path, 'no encontrada')})")
+            elif frame is not None:
+                frames.append(frame)
+        if lost:
+            st.warning("No se pudieron cargar algunas particiones de canciones; faltan sus canciones "
+                       "hasta que se puedan descargar: " + ", ".join(lost))
+        if not frames:
+            return create_empty_songs_dataframe()
+        return apply_song_schema(pd.concat([frame.astype(object) for frame in frames], ignore_index=True))
+
+    def _song_shard_changes(self, shards, manifest):
+        """Archivos a escribir para guardar shards ({mes: df}) y el manifiesto actualizado"""
+        manifest = copy.deepcopy(manifest) if manifest else {"shards": {}}
+        changes = {}
+        for month, df in shards.items():
+            path = self._shard_path(month)
+            changes[path] = serialize_songs_csv(df)
+            manifest["shards"][month] = {"path": path, "sha": git_blob_sha(changes[path]), "rows": len(df)}
+        changes[self.SONGS_MANIFEST_FILE] = self.FILE_FORMATS[self.SONGS_MANIFEST_FILE][1](manifest)
+        return changes
+
+    def read_songs(self):
+        self.prefetch()
+        try:
+            manifest, _ = get_github_parsed(self.SONGS_MANIFEST_FILE, json.loads, missing_ok=True,
+                                            max_age=self.fresh_seconds)
+            if manifest is not None:
+                df = self._read_song_shards(manifest)
+            else:
+                df, _ = get_github_parsed(self.SONGS_FILE, parse_songs_csv, max_age=self.fresh_seconds)
+            pending_rows = [row for entry in self._pending("add_songs") for row in entry["args"][0]]
+            if pending_rows:
+                df = create_empty_songs_dataframe() if df is None else df
+                existing_ids = set(df['youtube_id'])
+                new_rows = [row for row in pending_rows if row['youtube_id'] not in existing_ids]
+                if new_rows:
+                    # Las filas del journal vienen como texto: se vuelven a aplicar los tipos
+                    df = apply_song_schema(pd.concat([df.astype(object), pd.DataFrame(new_rows, columns=df.columns)],
+                                                     ignore_index=True))
+            return df
+        except Exception as e:
+            st.error(f"Error al parsear el CSV: {str(e)}")
+            # Crear un DataFrame vacío como fallback
+            return create_empty_songs_dataframe()
+
+    def write_songs(self, df, message=None):
+        return self.write_batch(songs=df, message=message)
+
+    def add_songs(self, rows):
+        return self._write_ahead("add_songs", rows)
+
+    def _add_songs(self, rows):
+        """Agrega las canciones a la partición de su mes; solo se reescriben esas particiones"""
+        months = song_months([row.get('fecha_sugerencia') for row in rows])
+        manifest, _ = get_github_parsed(self.SONGS_MANIFEST_FILE, json.loads, missing_ok=True)
+        file_paths = [self.SONGS_MANIFEST_FILE] + [self._shard_path(month) for month in sorted(set(months))]
+        if manifest is None:
+            file_paths.append(self.SONGS_FILE)
+        
+        def mutate(current):
+            manifest = current[self.SONGS_MANIFEST_FILE]
+            shards = {}
+            if manifest is None and current.get(self.SONGS_FILE) is not None:
+                # Migración: repartir el CSV anterior en particiones por mes
+                shards = split_songs_by_month(current[self.SONGS_FILE])
+            rows_by_month = collections.defaultdict(list)
+            for month, row in zip(months, rows):
+                rows_by_month[month].append(row)
+            for month, month_rows in rows_by_month.items():
+                shard = shards.get(month)
+                if shard is None:
+                    shard = current.get(self._shard_path(month))
+                if shard is None:
+                    shard = create_empty_songs_dataframe()
+                # Ignorar canciones que otro usuario ya agregó entretanto (o repetidas en rows)
+                seen = set(shard['youtube_id'])
+                new_rows = []
+                for row in month_rows:
+                    if row['youtube_id'] not in seen:
+                        seen.add(row['youtube_id'])
+                        new_rows.append(row)
+                if new_rows:
+                    shard = pd.concat([shard.astype(object), pd.DataFrame(new_rows, columns=shard.columns)],
+                                      ignore_index=True)
+                shards[month] = shard
+            changes = self._song_shard_changes(shards, manifest)
+            if manifest is None and current.get(self.SONGS_FILE) is not None:
+                changes[self.SONGS_FILE] = None
+            return changes
+        return self._update_files(file_paths, mutate)
+
+    def read_votes(self):
+        """Instantánea de votos con los eventos pendientes de compactar aplicados"""
+        self.prefetch()
+        try:
+            votes, _ = get_github_parsed(self.VOTES_FILE, json.loads, max_age=self.fresh_seconds)
+            events, _ = get_github_parsed(self.VOTES_LOG_FILE, parse_vote_log, missing_ok=True,
+                                          max_age=self.fresh_seconds)
+        except json.JSONDecodeError as e:
+            st.error(f"Error al decodificar JSON de votos: {str(e)}")
+            return {}
+        pending = self._pending("apply_votes")
+        if votes is None and events is None and not pending:
+            return None
+        votes = replay_vote_log(votes or {}, events or [])
+        for entry in pending:
+            for youtube_id, username, value in entry["args"][0]:
+                votes.setdefault(youtube_id, {})[username] = value
+        return votes
+
+    def write_votes(self, votes, message=None):
+        return self.write_batch(votes=votes, message=message)
+
+    def apply_votes(self, changes, message=None):
+        return self._write_ahead("apply_votes", [list(change) for change in changes], message)
+
+    def _apply_votes(self, changes, message=None):
+        """Agrega los votos al registro de eventos, compactándolo cuando crece demasiado"""
+        def mutate(current):
+            # Omitir los votos que ya están en GitHub: reenviar el mismo cambio no hace nada
+            current_votes = replay_vote_log(copy.deepcopy(current[self.VOTES_FILE] or {}),
+                                            current[self.VOTES_LOG_FILE] or [])
+            new_changes = [
+                (youtube_id, username, value) for youtube_id, username, value in changes
+                if current_votes.get(youtube_id, {}).get(username) != value
+            ]
+            if not new_changes:
+                return {}
+            return self._vote_log_changes(current, make_vote_events(new_changes))
+        return self._update_files([self.VOTES_FILE, self.VOTES_LOG_FILE], mutate, message)
+
+    # Escrituras que pasan por el journal y el método que las publica en GitHub.
+    # Todas son idempotentes, así que reenviar una que ya se publicó no cambia nada
+    JOURNAL_OPS = {"set_user": "_set_user", "add_songs": "_add_songs", "apply_votes": "_apply_votes"}
+
+    def _pending(self, op):
+        return self.journal.pending(op) if self.journal else []
+
+    def _write_ahead(self, op, *args):
+        """Guarda el cambio en el journal y, si hay conexión, publica todo lo pendiente.
+
+        Devuelve False solo si GitHub rechazó el cambio; si no se pudo publicar
+        todavía, queda en el journal y se publicará después.
+        """
+        if self.journal is None:
+            try:
+                return getattr(self, self.JOURNAL_OPS[op])(*args)
+            except GitHubRejectedError as e:
+                st.error(f"GitHub rechazó el cambio: {e}")
+                return False
+        entry = self.journal.append(op, list(args))
+        # Sin conexión no se espera a GitHub: el hilo de sincronización publicará después
+        published = self.replay_journal() if get_github_client().available() else False
+        entry = self.journal.get(entry["id"])
+        if entry and "error" in entry:
+            st.error(f"GitHub rechazó el cambio: {entry['error']}")
+            return False
+        # None: otro hilo ya está publicando el journal, incluido este cambio
+        if entry and published is False:
+            st.warning("No se pudo publicar en GitHub: el cambio quedó guardado en este equipo "
+                       "y se publicará automáticamente cuando vuelva la conexión.")
+        return True
+
+    def replay_journal(self):
+        """Publica en orden los cambios del journal.
+
+        Los votos consecutivos se publican juntos en un solo commit. Un cambio que
+        GitHub rechaza se aparta (ver rejected_changes) y se sigue con el resto; ante
+        un fallo pasajero se detiene para conservar el orden. Devuelve True si no
+        queda nada pendiente, False si algo falló y None si otro hilo ya está publicando.
+        """
+        if self.journal is None:
+            return True
+        if not self.journal.replay_lock.acquire(blocking=False):
+            return None
+        try:
+            groups = itertools.groupby(self.journal.pending(),
+                                       key=lambda entry: "votes" if entry["op"] == "apply_votes" else entry["id"])
+            for _, group in groups:
+                group = list(group)
+                ids = [entry["id"] for entry in group]
+                op = group[0]["op"]
+                args = self._merge_vote_entries(group) if op == "apply_votes" else group[0]["args"]
+                try:
+                    ok = getattr(self, self.JOURNAL_OPS[op])(*args)
+                except GitHubRejectedError as e:
+                    self.journal.reject(ids, str(e))
+                    continue
+                if not ok:
+                    return False
+                self.journal.remove(*ids)
+            return True
+        finally:
+            self.journal.replay_lock.release()
+
+    @staticmethod
+    def _merge_vote_entries(entries):
+        """Junta los votos de varias entradas del journal; gana el último voto de cada usuario"""
+        votes = {}
+        for entry in entries:
+            for youtube_id, username, value in entry["args"][0]:
+                votes[(youtube_id, username)] = value
+        changes = [[youtube_id, username, value] for (youtube_id, username), value in votes.items()]
+        message = entries[0]["args"][1] if len(entries) == 1 else None
+        return [changes, message or f"Registro de {len(changes)} votos"]
+
+    def record_votes(self, changes):
+        # Cada voto va al journal en cuanto se acepta; publish_votes los publica juntos
+        if self.journal is not None:
+            self.journal.append("apply_votes", [[list(change) for change in changes], None])
+
+    def publish_votes(self, changes, message=None):
+        if self.journal is None:
+            return self.apply_votes(changes, message)
+        return bool(self.replay_journal())
+
+    def rejected_changes(self):
+        return self.journal.rejected() if self.journal else []
+
+    def resolve_rejected_change(self, entry_id, retry):
+        if retry:
+            self.journal.retry(entry_id)
+            self.replay_journal()
+        else:
+            self.journal.remove(entry_id)
+
+    def _vote_log_changes(self, current, new_events):
+        """Archivos a escribir para agregar new_events al registro de votos.
+
+        La API de GitHub no permite agregar al final de un archivo: cada publicación
+        vuelve a subir el registro entero, que por eso se compacta al llegar a
+        compact_after eventos.
+        """
+        events = (current[self.VOTES_LOG_FILE] or []) + new_events
+        if len(events) < self.compact_after:
+            return {self.VOTES_LOG_FILE: serialize_vote_log(events)}
+        # Compactar: plegar el registro en la instantánea y archivarlo como historial
+        serialize_votes = self.FILE_FORMATS[self.VOTES_FILE][1]
+        votes = replay_vote_log(current[self.VOTES_FILE] or {}, events)
+        archive = f"{self.VOTES_HISTORY_DIR}/{datetime.now():%Y%m%d-%H%M%S}.jsonl"
+        return {
+            self.VOTES_FILE: serialize_votes(votes),
+            self.VOTES_LOG_FILE: "",
+            archive: serialize_vote_log(events),
+        }
+
+    def _vote_changes(self, current, votes):
+        """Eventos necesarios para que el estado actual de los votos quede igual a votes"""
+        current_votes = replay_vote_log(current[self.VOTES_FILE] or {}, current[self.VOTES_LOG_FILE] or [])
+        return [
+            (youtube_id, username, value)
+            for youtube_id, song_votes in votes.items()
+            for username, value in song_votes.items()
+            if current_votes.get(youtube_id, {}).get(username) != value
+        ]
+
+    def write_batch(self, users=None, songs=None, votes=None, message=None):
+        """Publica todos los archivos modificados en un único commit.
+
+        Si otro usuario escribió entretanto, fusiona registro a registro nuestra
+        versión con la suya (tomando como base la versión que leímos) y reintenta.
+        Los votos se escriben como eventos con las diferencias respecto a la
+        versión más reciente.
+        """
+        # Versión de usuarios que leyó esta sesión: base de la fusión de tres vías
+        base_sha = st.session_state.get('users_sha')
+        
+        def build(attempt):
+            staged = {}
+            if votes is not None:
+                current, shas = {}, {}
+                for file_path in (self.VOTES_FILE, self.VOTES_LOG_FILE):
+                    current[file_path], shas[file_path] = get_github_parsed(
+                        file_path, self.FILE_FORMATS[file_path][0], missing_ok=True, strict=True)
+                new_events = make_vote_events(self._vote_changes(current, votes))
+                if shas[self.VOTES_FILE] is None:
+                    # Todavía no hay instantánea: crearla directamente con todos los votos
+                    snapshot = replay_vote_log(replay_vote_log({}, current[self.VOTES_LOG_FILE] or []), new_events)
+                    staged[self.VOTES_FILE] = (self.FILE_FORMATS[self.VOTES_FILE][1](snapshot), None)
+                    if current[self.VOTES_LOG_FILE]:
+                        staged[self.VOTES_LOG_FILE] = ("", shas[self.VOTES_LOG_FILE])
+                elif new_events:
+                    for file_path, content in self._vote_log_changes(current, new_events).items():
+                        staged[file_path] = (content, shas.get(file_path))
+            if songs is not None:
+                staged.update(self._stage_song_shards(songs))
+            if users is not None:
+                parse, serialize = self.FILE_FORMATS[self.USERS_FILE]
+                if attempt == 0:
+                    staged[self.USERS_FILE] = (serialize(users), base_sha)
+                else:
+                    theirs, theirs_sha = get_github_parsed(self.USERS_FILE, parse, missing_ok=True, strict=True)
+                    base_content = get_github_file_cache().content_at(self.USERS_FILE, base_sha)
+                    base = parse(base_content) if base_content else None
+                    staged[self.USERS_FILE] = (serialize(merge_users(base, users, theirs)), theirs_sha)
+            return staged
+        
+        return self._commit_with_retry(build, message)
+
+    def _stage_song_shards(self, songs):
+        """Cambios para guardar la tabla completa songs en particiones.
+
+        Cada partición se fusiona con su versión actual en GitHub: se conservan las
+        canciones que otro usuario agregó entretanto.
+        """
+        manifest, manifest_sha = get_github_parsed(self.SONGS_MANIFEST_FILE, json.loads, missing_ok=True,
+                                                   strict=True)
+        shards, shas = {}, {self.SONGS_MANIFEST_FILE: manifest_sha}
+        for month, ours in split_songs_by_month(songs).items():
+            path = self._shard_path(month)
+            theirs, shas[path] = get_github_parsed(path, parse_songs_csv, missing_ok=True, strict=True)
+            shards[month] = ours if theirs is None else merge_songs(None, ours, theirs)
+        staged = {path: (content, shas.get(path)) for path, content in self._song_shard_changes(shards, manifest).items()}
+        if manifest is None:
+            _, legacy_sha = get_github_file(self.SONGS_FILE, missing_ok=True, strict=True)
+            if legacy_sha:
+                staged[self.SONGS_FILE] = (None, legacy_sha)
+        return staged
+
+    def _update_file(self, file_path, mutate, message=None):
+        """Lee la última versión del archivo, aplica mutate y la publica"""
+        serialize = self._file_format(file_path)[1]
+        return self._update_files(
+            [file_path],
+            lambda current: {file_path: serialize(mutate(current[file_path]))},
+            message
+        )
+
+    def _update_files(self, file_paths, mutate, message=None):
+        """Lee la última versión de varios archivos y publica lo que devuelva mutate.
+
+        mutate recibe {ruta: objeto parseado} y devuelve {ruta: contenido nuevo}. Ante
+        un conflicto se vuelve a leer y a aplicar el cambio sobre la versión nueva.
+        """
+        def build(attempt):
+            current, shas = {}, {}
+            for file_path in file_paths:
+                # strict: un archivo que no se pudo leer no se confunde con uno que no existe
+                current[file_path], shas[file_path] = get_github_parsed(
+                    file_path, self._file_format(file_path)[0], missing_ok=True, strict=True)
+            return {
+                file_path: (content, shas.get(file_path))
+                for file_path, content in mutate(current).items()
+            }
+        
+        return self._commit_with_retry(build, message)
+
+    def _commit_with_retry(self, build, message=None):
+        """Publica lo que devuelve build(intento), reintentando ante conflictos"""
+        for attempt in range(self.MAX_COMMIT_ATTEMPTS):
+            try:
+                commit = GitHubCommit(message)
+                for file_path, (content, sha) in build(attempt).items():
+                    commit.stage(file_path, content, sha)
+                return commit.push()
+            except GitHubReadError as e:
+                # No se escribe sin conocer la versión actual; el cambio sigue en el journal
+                st.error(f"No se pudo guardar: {e}")
+                return False
+            except GitHubConflictError:
+                # Espera con jitter para no chocar de nuevo con la misma escritura
+                time.sleep(random.uniform(0, 0.25 * 2 ** attempt))
+        st.error("No se pudo guardar: los datos cambiaron en GitHub demasiadas veces. Intenta de nuevo.")
+        return False
+
+class SQLiteStorage(StorageBackend):
+    """Backend local que guarda canciones, votos y usuarios como filas indexadas"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            nombre TEXT NOT NULL,
+            rol TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS canciones (
+            youtube_id TEXT PRIMARY KEY,
+            url TEXT,
+            titulo_cancion TEXT,
+            artista TEXT,
+            genero TEXT,
+            dificultad TEXT,
+            sugerido_por TEXT,
+            fecha_sugerencia TEXT,
+            notas TEXT,
+            votos_count INTEGER DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_canciones_fecha ON canciones (fecha_sugerencia);
+        CREATE TABLE IF NOT EXISTS votos (
+            youtube_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            valor INTEGER NOT NULL,
+            PRIMARY KEY (youtube_id, username)
+        );
+        CREATE INDEX IF NOT EXISTS idx_votos_username ON votos (username);
+        CREATE TABLE IF NOT EXISTS votos_eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL,
+            youtube_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            valor INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path, seed_dir=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.conn:
+            self.conn.executescript(self.SCHEMA)
+        if seed_dir:
+            self.seed_from_files(seed_dir)
+
+    def seed_from_files(self, directory):
+        """Importa las copias locales de los archivos de GitHub si la base está vacía"""
+        with self.lock:
+            if self.conn.execute("SELECT COUNT(*) FROM usuarios").fetchone()[0]:
+                return
+            users_path = os.path.join(directory, GitHubStorage.USERS_FILE)
+            songs_path = os.path.join(directory, GitHubStorage.SONGS_FILE)
+            votes_path = os.path.join(directory, GitHubStorage.VOTES_FILE)
+            users = songs = votes = None
+            if os.path.exists(users_path):
+                with open(users_path, encoding="utf-8") as f:
+                    users = json.load(f)
+            if os.path.exists(songs_path):
+                with open(songs_path, encoding="utf-8") as f:
+                    songs = parse_songs_csv(f.read())
+            if os.path.exists(votes_path):
+                with open(votes_path, encoding="utf-8") as f:
+                    votes = json.load(f)
+            self.write_batch(users=users, songs=songs, votes=votes)
+
+    def change_token(self):
+        # data_version cambia con los commits de otras conexiones; total_changes, con los nuestros
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0], self.conn.total_changes
+
+    def read_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT username, password, nombre, rol FROM usuarios").fetchall()
+        if not rows:
+            return None
+        return {
+            username: {"password": password, "nombre": nombre, "rol": rol}
+            for username, password, nombre, rol in rows
+        }
+
+    def write_users(self, users, message=None):
+        return self.write_batch(users=users)
+
+    def _replace_users(self, users):
+        self.conn.execute("DELETE FROM usuarios")
+        self.conn.executemany(
+            "INSERT INTO usuarios (username, password, nombre, rol) VALUES (?, ?, ?, ?)",
+            [(username, info["password"], info["nombre"], info["rol"]) for username, info in users.items()]
+        )
+
+    def set_user(self, username, info):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO usuarios (username, password, nombre, rol) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (username) DO UPDATE SET password = excluded.password, "
+                "nombre = excluded.nombre, rol = excluded.rol",
+                (username, info["password"], info["nombre"], info["rol"])
+            )
+        return True
+
+    def read_songs(self):
+        with self.lock:
+            df = pd.read_sql_query(f"SELECT {', '.join(SONG_COLUMNS)} FROM canciones ORDER BY rowid", self.conn)
+        return apply_song_schema(df) if not df.empty else create_empty_songs_dataframe()
+
+    def _song_rows(self, rows):
+        def value(row, column):
+            if pd.isna(row.get(column)):
+                return None
+            # Las fechas se guardan como texto AAAA-MM-DD
+            if isinstance(row[column], (pd.Timestamp, datetime)):
+                return format_date(row[column])
+            return row[column]
+        return [tuple(value(row, column) for column in SONG_COLUMNS) for row in rows]
+
+    def write_songs(self, df, message=None):
+        return self.write_batch(songs=df)
+
+    def _replace_songs(self, df):
+        self.conn.execute("DELETE FROM canciones")
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO canciones ({', '.join(SONG_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in SONG_COLUMNS)})",
+            self._song_rows(df.to_dict('records'))
+        )
+
+    def add_songs(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO canciones ({', '.join(SONG_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in SONG_COLUMNS)})",
+                self._song_rows(rows)
+            )
+        return True
+
+    def read_votes(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT youtube_id, username, valor FROM votos").fetchall()
+        votes = {}
+        for youtube_id, username, value in rows:
+            votes.setdefault(youtube_id, {})[username] = bool(value)
+        return votes
+
+    def write_votes(self, votes, message=None):
+        return self.write_batch(votes=votes)
+
+    def _replace_votes(self, votes):
+        self.conn.execute("DELETE FROM votos")
+        self.conn.executemany(
+            "INSERT INTO votos (youtube_id, username, valor) VALUES (?, ?, ?)",
+            [
+                (youtube_id, username, int(bool(value)))
+                for youtube_id, song_votes in votes.items()
+                for username, value in song_votes.items()
+            ]
+        )
+
+    def write_batch(self, users=None, songs=None, votes=None, message=None):
+        """Guarda todos los recursos indicados en una sola transacción"""
+        with self.lock, self.conn:
+            if users is not None:
+                self._replace_users(users)
+            if songs is not None:
+                self._replace_songs(songs)
+            if votes is not None:
+                self._replace_votes(votes)
+        return True
+
+    def apply_votes(self, changes, message=None):
+        """Actualiza los votos fila por fila y los agrega al historial de eventos"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO votos_eventos (ts, youtube_id, username, valor) VALUES (?, ?, ?, ?)",
+                [
+                    (event["ts"], event["youtube_id"], event["username"], int(event["valor"]))
+                    for event in make_vote_events(changes)
+                ]
+            )
+            self.conn.executemany(
+                "INSERT INTO votos (youtube_id, username, valor) VALUES (?, ?, ?) "
+                "ON CONFLICT (youtube_id, username) DO UPDATE SET valor = excluded.valor",
+                [(youtube_id, username, int(bool(value))) for youtube_id, username, value in changes]
+            )
+        return True
+
+@st.cache_resource
+def get_storage():
+    """Devuelve el backend de almacenamiento configurado (uno por proceso)"""
+    if STORAGE_BACKEND == "sqlite":
+        seed_dir = os.path.dirname(os.path.abspath(__file__)) if STORAGE_CONFIG.get("seed", True) else None
+        return SQLiteStorage(STORAGE_CONFIG.get("path", "sugerencias.db"), seed_dir=seed_dir)
+    return GitHubStorage(compact_after=STORAGE_CONFIG.get("vote_log_compact_after", 100),
+                         fresh_seconds=SYNC_SECONDS,
+                         journal=WriteAheadJournal(os.path.join(LOCAL_DIR, "journal.jsonl")))
+
+# Funciones para manejar usuarios
+@st.cache_data(ttl=CACHE_TTL)
+def load_users():
+    try:
+        users = get_storage().read_users()
+        
+        if users:
+            return users
+        else:
+            # Usuario admin por defecto
+            default_users = {
+                "admin": {
+                    "password": hashlib.sha256("admin123".encode()).hexdigest(),
+                    "nombre": "JeZz Barrientos",
+                    "rol": "admin"
+                }
+            }
+            
+            # Intentar crear el almacenamiento de usuarios, pero no reintentar si falla
+            try:
+                get_storage().write_users(default_users, message="Creación inicial de usuarios.json")
+                # No llamar a load_users() de nuevo para evitar recursión
+            except Exception as e:
+                st.warning(f"No se pudo crear el archivo de usuarios: {str(e)}")
+                st.info("Usando usuarios predeterminados en memoria temporalmente")
+            
+            return default_users
+    except Exception as e:
+        st.error(f"Error al cargar usuarios: {str(e)}")
+        # Devolver un conjunto predeterminado de usuarios para que la aplicación funcione
+        return {
+            "admin": {
+                "password": hashlib.sha256("admin123".encode()).hexdigest(),
+                "nombre": "Administrador",
+                "rol": "admin"
+            }
+        }
+def save_user(username, info):
+    """Crea o actualiza un único usuario"""
+    if get_storage().set_user(username, info):
+        load_users.clear()
+        return True
+    return False
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+def check_credentials(username, password):
+    users = load_users()
+    if username in users and users[username]["password"] == hash_password(password):
+        return True
+    return False
+
+def get_user_info(username):
+    users = load_users()
+    return users.get(username, {})
+
+def change_password(username, new_password):
+    users = load_users()
+    if username in users:
+        info = dict(users[username])
+        info["password"] = hash_password(new_password)
+        return save_user(username, info)
+    return False
+
+def reset_password(username, new_password):
+    return change_password(username, new_password)
+
+# Funciones para manejar canciones
+def songs_version(df):
+    """Identificador del contenido de las canciones; cambia si cambia cualquier fila o su orden"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+@st.cache_data(ttl=CACHE_TTL)
+def load_data():
+    """Canciones guardadas; df.attrs['version'] identifica esta versión de los datos"""
+    try:
+        df = get_storage().read_songs()
+        
+        if df is None:
+            # Crear DataFrame vacío y guardarlo como archivo inicial
+            df = create_empty_songs_dataframe()
+            get_storage().write_songs(df, message="Creación inicial de canciones_sugeridas.csv")
+    except Exception as e:
+        st.error(f"Error al cargar datos: {str(e)}")
+        # En caso de error, devolver un DataFrame vacío
+        df = create_empty_songs_dataframe()
+    
+    df.attrs['version'] = songs_version(df)
+    return df
+
+def add_song(song):
+    """Agrega una nueva canción sin reescribir las demás cuando el backend lo permite"""
+    return add_songs([song])
+
+def add_songs(songs):
+    """Agrega varias canciones en una sola escritura"""
+    if get_storage().add_songs(songs):
+        load_data.clear()
+        build_songs_with_votes.clear()
+        return True
+    return False
+
+def resolve_rejected_change(entry_id, retry):
+    """Reintenta o descarta un cambio rechazado y refresca los datos"""
+    get_storage().resolve_rejected_change(entry_id, retry)
+    clear_data_caches()
+
+def video_exists(video_id, data):
+    index = get_duplicate_index()
+    index.sync(data)
+    return index.has_id(video_id)
+
+# Importación masiva de sugerencias
+def read_import_entries(csv_file=None, urls_text=""):
+    """Genera (línea, fila) de un CSV subido (con columna url) o de una lista de URLs, una por línea"""
+    if csv_file is not None:
+        reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding="utf-8-sig"))
+        for line, row in enumerate(reader, start=2):
+            yield line, {key.strip(): (value or "").strip() for key, value in row.items() if key}
+    for line, url in enumerate(urls_text.splitlines(), start=1):
+        if url.strip():
+            yield line, {"url": url.strip()}
+
+def prepare_import(entries, data, sugerido_por):
+    """Valida y deduplica las entradas en una sola pasada.
+
+    Los metadatos de todos los videos se resuelven al final, por lotes.
+    Devuelve (canciones nuevas, omitidas), donde omitidas es una lista de
+    (línea, url, motivo).
+    """
+    index = get_duplicate_index()
+    index.sync(data)
+    fecha = datetime.now().strftime(DATE_FORMAT)
+    seen = set()
+    candidates, skipped = [], []
+    for line, entry in entries:
+        url = entry.get("url", "")
+        video_id = extract_youtube_id(url) if url else None
+        if not video_id:
+            motivo = ("Lista de reproducción sin video: abre el video y copia su URL"
+                      if "list=" in url else "URL de YouTube no válida")
+            skipped.append((line, url, motivo))
+            continue
+        if index.has_id(video_id):
+            skipped.append((line, url, "Ya fue sugerida"))
+            continue
+        if video_id in seen:
+            skipped.append((line, url, "Repetida en la importación"))
+            continue
+        genero = entry.get("genero") or "Otro"
+        dificultad = entry.get("dificultad") or "Intermedia"
+        if genero not in GENRE_OPTIONS or dificultad not in DIFFICULTY_LEVELS:
+            skipped.append((line, url, f"Género o dificultad desconocidos: {genero} / {dificultad}"))
+            continue
+        seen.add(video_id)
+        candidates.append((line, url, {
+            'youtube_id': video_id,
+            'url': url,
+            'titulo_cancion': entry.get("titulo_cancion", ""),
+            'artista': entry.get("artista", ""),
+            'genero': genero,
+            'dificultad': dificultad,
+            'sugerido_por': entry.get("sugerido_por") or sugerido_por,
+            'fecha_sugerencia': entry.get("fecha_sugerencia") or fecha,
+            'notas': entry.get("notas", ""),
+            'votos_count': 0
+        }))
+    
+    videos = resolve_videos([song['youtube_id'] for _, _, song in candidates])
+    songs = []
+    for line, url, song in candidates:
+        video_info = videos.get(song['youtube_id'], {})
+        if video_info is None:
+            skipped.append((line, url, "El video no existe o no está disponible"))
+            continue
+        if not song['titulo_cancion']:
+            # Sin proveedor de metadatos (o sin respuesta) se guarda un título provisional
+            song['titulo_cancion'] = video_info.get("title") or f"Video {song['youtube_id']}"
+        songs.append(song)
+    return songs, skipped
+
+@st.cache_data(ttl=CACHE_TTL)
+def load_votes():
+    try:
+        votes = get_storage().read_votes()
+        
+        if votes is not None:
+            return votes
+        else:
+            # Crear objeto vacío y guardarlo como archivo inicial
+            empty_votes = {}
+            get_storage().write_votes(empty_votes, message="Creación inicial de votos.json")
+            return empty_votes
+    except Exception as e:
+        st.error(f"Error al cargar votos: {str(e)}")
+        return {}
+
+# Cola de escritura diferida para los votos
+class VoteQueue:
+    """Acumula votos en memoria y los publica juntos en un solo commit.
+
+    Cada voto se guarda en el backend con record_votes (en GitHub, en el journal)
+    y se confirma al instante; un hilo en segundo plano publica los pendientes
+    cada flush_interval segundos o al llegar a max_pending votos.
+    Si un usuario vota varias veces la misma canción gana el último voto.
+    """
+
+    def __init__(self, storage, on_flush=None, flush_interval=5, max_pending=20):
+        self.storage = storage
+        self.on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = {}  # (youtube_id, username) -> valor
+        self.version = 0
+        self.wakeup = threading.Event()
+        threading.Thread(target=self._run, name="vote-queue", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add(self, youtube_id, username, value):
+        # Guardar el voto antes de confirmarlo: no se pierde aunque el proceso termine
+        self.storage.record_votes([(youtube_id, username, value)])
+        with self.lock:
+            self.pending[(youtube_id, username)] = value
+            self.version += 1
+            full = len(self.pending) >= self.max_pending
+        if full:
+            self.wakeup.set()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.pending)
+
+    def _run(self):
+        mark_background_thread()
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Publica los votos pendientes. Si falla, se conservan para el siguiente intento"""
+        with self.flush_lock:
+            changes = self.snapshot()
+            if not changes:
+                return True
+            ok = self.storage.publish_votes(
+                [(youtube_id, username, value) for (youtube_id, username), value in changes.items()],
+                message=f"Registro de {len(changes)} votos"
+            )
+            if not ok:
+                return False
+            if self.on_flush:
+                self.on_flush()
+            with self.lock:
+                for key, value in changes.items():
+                    # Conservar los votos que cambiaron mientras se publicaba
+                    if self.pending.get(key) == value:
+                        del self.pending[key]
+                self.version += 1
+            return True
+
+@st.cache_resource
+def get_vote_queue():
+    return VoteQueue(
+        get_storage(),
+        on_flush=clear_vote_caches,
+        flush_interval=STORAGE_CONFIG.get("vote_flush_seconds", 5),
+        max_pending=STORAGE_CONFIG.get("vote_flush_max", 20)
+    )
+
+def clear_vote_caches():
+    """Invalida todas las vistas que dependen de los votos"""
+    load_votes.clear()
+    build_vote_table.clear()
+    build_vote_index.clear()
+    build_songs_with_votes.clear()
+
+def clear_data_caches():
+    """Invalida las cargas de usuarios, canciones y votos y todas sus vistas"""
+    load_users.clear()
+    load_data.clear()
+    clear_vote_caches()
+
+class DataSync:
+    """Hilo en segundo plano (uno por proceso) que detecta cambios en el almacenamiento.
+
+    Cuando los datos cambian, vacía las caches compartidas una sola vez y sube
+    version; cada sesión vigila version y se vuelve a ejecutar al verla cambiar,
+    en vez de esperar a que caduquen las caches y consultar todas a la vez.
+    """
+
+    def __init__(self, storage, interval=10):
+        self.storage = storage
+        self.interval = interval
+        self.version = 0
+        self.token = None
+        threading.Thread(target=self._run, name="data-sync", daemon=True).start()
+
+    def _run(self):
+        mark_background_thread()
+        while True:
+            try:
+                self.check()
+            except Exception:
+                # Se reintenta en la siguiente vuelta
+                pass
+            time.sleep(self.interval)
+
+    def check(self):
+        self.storage.replay_journal()
+        token = self.storage.change_token()
+        if token is None:
+            return
+        if self.token is not None and token != self.token:
+            clear_data_caches()
+            self.version += 1
+        self.token = token
+
+@st.cache_resource
+def get_data_sync():
+    return DataSync(get_storage(), interval=SYNC_SECONDS)
+
+def vote_song(youtube_id, username, vote_value=True):
+    """Registra el voto en la cola; se publicará junto con otros en segundo plano"""
+    get_vote_queue().add(youtube_id, username, vote_value)
+    return True
+
+def votes_to_table(votes):
+    """Convierte el diccionario anidado de votos en una tabla plana (youtube_id, username, valor)"""
+    return pd.DataFrame.from_records(
+        [
+            (youtube_id, username, bool(value))
+            for youtube_id, song_votes in votes.items()
+            for username, value in song_votes.items()
+        ],
+        columns=['youtube_id', 'username', 'valor']
+    ).astype({'valor': bool})
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=8)
+def build_vote_table(pending_version):
+    """Tabla de votos guardados con los votos pendientes de la cola aplicados encima"""
+    vote_table = votes_to_table(load_votes())
+    pending = get_vote_queue().snapshot()
+    if pending:
+        pending_table = pd.DataFrame.from_records(
+            [(youtube_id, username, bool(value)) for (youtube_id, username), value in pending.items()],
+            columns=['youtube_id', 'username', 'valor']
+        )
+        vote_table = (pd.concat([vote_table, pending_table], ignore_index=True)
+                      .drop_duplicates(['youtube_id', 'username'], keep='last'))
+    return vote_table
+
+def count_votes(vote_table):
+    """Cuenta los votos positivos de cada canción con un único groupby"""
+    return vote_table[vote_table['valor']].groupby('youtube_id').size().rename('votos_count')
+
+class VoteIndex:
+    """Índice de solo lectura de los votos positivos: usuario -> canciones y canción -> conteo"""
+
+    def __init__(self, vote_table):
+        positive = vote_table[vote_table['valor']]
+        self.voted_by_user = positive.groupby('username')['youtube_id'].agg(frozenset).to_dict()
+        self.counts = positive.groupby('youtube_id').size().to_dict()
+
+    def has_voted(self, youtube_id, username):
+        return youtube_id in self.voted_by_user.get(username, ())
+
+    def count(self, youtube_id):
+        return self.counts.get(youtube_id, 0)
+
+    def songs_voted_by(self, username):
+        return self.voted_by_user.get(username, frozenset())
+
+# cache_resource: el índice se comparte sin copiarlo en cada lectura
+@st.cache_resource(ttl=CACHE_TTL, max_entries=8)
+def build_vote_index(pending_version):
+    return VoteIndex(build_vote_table(pending_version))
+
+def load_vote_index():
+    """Índice de votos de la versión actual, construido una sola vez por versión"""
+    return build_vote_index(get_vote_queue().version)
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=8)
+def build_songs_with_votes(pending_version):
+    """Canciones con el conteo de votos calculado a partir de los votos actuales.
+
+    El conteo es una vista derivada: no se guarda en canciones_sugeridas.csv.
+    """
+    songs = load_data()
+    data = songs.drop(columns='votos_count', errors='ignore')
+    data = data.merge(count_votes(build_vote_table(pending_version)), how='left',
+                      left_on='youtube_id', right_index=True)
+    data['votos_count'] = data['votos_count'].fillna(0).astype(int)
+    data.attrs['version'] = songs.attrs.get('version')
+    data.attrs['votes_version'] = songs_version(data[['youtube_id', 'votos_count']])
+    return data
+
+def load_songs_with_votes():
+    return build_songs_with_votes(get_vote_queue().version)
+
+# Búsqueda de texto sobre las sugerencias
+def normalize_text(text):
+    """Minúsculas, sin acentos y solo letras y números"""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9ñ]+", " ", text).strip()
+
+def tokenize(text):
+    return normalize_text(text).split()
+
+class IncrementalSongIndex:
+    """Base de los índices en memoria sobre las canciones.
+
+    Al cambiar la versión de los datos solo se reindexan las filas nuevas o
+    modificadas (comparando un hash por fila de las columnas indexadas).
+    """
+
+    COLUMNS = []
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.row_hashes = {}  # youtube_id -> hash de la fila indexada
+
+    def sync(self, df):
+        """Pone el índice al día con df"""
+        version = df.attrs.get('version')
+        if version is not None and version == self.version:
+            return
+        columns = ['youtube_id'] + self.COLUMNS
+        rows = df[columns].drop_duplicates('youtube_id', keep='last')
+        hashes = dict(zip(rows['youtube_id'], pd.util.hash_pandas_object(rows, index=False)))
+        with self.lock:
+            for youtube_id in [doc for doc in self.row_hashes if hashes.get(doc) != self.row_hashes[doc]]:
+                self._unindex(youtube_id)
+                del self.row_hashes[youtube_id]
+            changed = [doc for doc, row_hash in hashes.items() if self.row_hashes.get(doc) != row_hash]
+            if changed:
+                for row in rows[rows['youtube_id'].isin(changed)].itertuples(index=False):
+                    self._index(row[0], dict(zip(self.COLUMNS, row[1:])))
+                    self.row_hashes[row[0]] = hashes[row[0]]
+            self.version = version
+
+    def _index(self, youtube_id, fields):
+        raise NotImplementedError
+
+    def _unindex(self, youtube_id):
+        raise NotImplementedError
+
+class SearchIndex(IncrementalSongIndex):
+    """Índice invertido con tolerancia a errores sobre título, artista y notas.
+
+    Las coincidencias exactas puntúan más que las de prefijo (búsqueda mientras se
+    escribe) y estas más que las aproximadas (una letra de diferencia, mediante un
+    índice de borrados).
+    """
+
+    FIELD_WEIGHTS = {'titulo_cancion': 3.0, 'artista': 2.0, 'notas': 1.0}
+    COLUMNS = list(FIELD_WEIGHTS)
+    PREFIX_FACTOR = 0.7
+    FUZZY_FACTOR = 0.5
+    MIN_FUZZY_LENGTH = 4
+
+    def __init__(self):
+        super().__init__()
+        self.doc_terms = {}        # youtube_id -> {término: peso}
+        self.postings = {}         # término -> {youtube_id: peso}
+        self.vocabulary = []       # términos ordenados, para búsqueda por prefijo
+        self.deletes = {}          # término con una letra borrada -> términos originales
+
+    def _index(self, youtube_id, fields):
+        terms = {}
+        for field, weight in self.FIELD_WEIGHTS.items():
+            value = fields.get(field)
+            if pd.isna(value):
+                continue
+            for term in tokenize(value):
+                terms[term] = terms.get(term, 0.0) + weight
+        self.doc_terms[youtube_id] = terms
+        for term, weight in terms.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                bisect.insort(self.vocabulary, term)
+                for variant in self._deletions(term):
+                    self.deletes.setdefault(variant, set()).add(term)
+            self.postings[term][youtube_id] = weight
+
+    def _unindex(self, youtube_id):
+        for term in self.doc_terms.pop(youtube_id, {}):
+            documents = self.postings.get(term, {})
+            documents.pop(youtube_id, None)
+            if not documents:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+                for variant in self._deletions(term):
+                    self.deletes.get(variant, set()).discard(term)
+
+    def _deletions(self, term):
+        """El término y todas sus variantes con una letra borrada"""
+        if len(term) < self.MIN_FUZZY_LENGTH:
+            return {term}
+        return {term} | {term[:i] + term[i + 1:] for i in range(len(term))}
+
+    def _matches(self, query_term):
+        """Términos del vocabulario que coinciden con query_term y el factor de cada uno"""
+        matches = {}
+        if len(query_term) >= self.MIN_FUZZY_LENGTH:
+            for variant in self._deletions(query_term):
+                for term in self.deletes.get(variant, ()):
+                    matches[term] = self.FUZZY_FACTOR
+        start = bisect.bisect_left(self.vocabulary, query_term)
+        for term in itertools.islice(self.vocabulary, start, None):
+            if not term.startswith(query_term):
+                break
+            matches[term] = max(matches.get(term, 0.0), self.PREFIX_FACTOR)
+        if query_term in self.postings:
+            matches[query_term] = 1.0
+        return matches
+
+    def search(self, query, limit=None):
+        """youtube_ids que contienen todos los términos de la búsqueda, de mayor a menor relevancia"""
+        query_terms = tokenize(query)
+        if not query_terms:
+            return []
+        with self.lock:
+            total = max(len(self.doc_terms), 1)
+            scores = None
+            for query_term in query_terms:
+                term_scores = {}
+                for term, factor in self._matches(query_term).items():
+                    documents = self.postings[term]
+                    idf = math.log(1 + total / len(documents))
+                    for youtube_id, weight in documents.items():
+                        score = factor * idf * weight
+                        if score > term_scores.get(youtube_id, 0.0):
+                            term_scores[youtube_id] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc: scores[doc] + score for doc, score in term_scores.items() if doc in scores}
+                if not scores:
+                    return []
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return ranked[:limit] if limit else ranked
+
+# Palabras que distinguen versiones de una misma canción y no la canción en sí
+VERSION_NOISE_WORDS = {
+    "live", "en", "vivo", "official", "oficial", "video", "videoclip", "audio", "lyrics", "lyric",
+    "letra", "hd", "4k", "acustico", "acoustic", "version", "feat", "ft", "con", "cover"
+}
+
+def song_fingerprint(title, artist):
+    """Texto normalizado de título y artista sin paréntesis ni palabras de versión"""
+    title = re.sub(r"[\(\[].*?[\)\]]", " ", "" if pd.isna(title) else str(title))
+    artist = "" if pd.isna(artist) else str(artist)
+    return " ".join(word for word in tokenize(f"{title} {artist}") if word not in VERSION_NOISE_WORDS)
+
+class DuplicateIndex(IncrementalSongIndex):
+    """Detecta sugerencias repetidas: por youtube_id exacto y por título y artista parecidos.
+
+    Los parecidos se buscan con MinHash sobre trigramas de caracteres y LSH por
+    bandas, así que solo se comparan las canciones que comparten alguna banda.
+    """
+
+    COLUMNS = ['titulo_cancion', 'artista']
+    NUM_PERM = 32
+    BANDS = 8
+    SHINGLE_SIZE = 3
+    THRESHOLD = 0.6
+    PRIME = (1 << 31) - 1
+
+    def __init__(self):
+        super().__init__()
+        # Semilla fija: las firmas deben ser comparables durante toda la vida del proceso
+        rng = np.random.default_rng(27)
+        self.perm_a = rng.integers(1, self.PRIME, self.NUM_PERM, dtype=np.uint64)
+        self.perm_b = rng.integers(0, self.PRIME, self.NUM_PERM, dtype=np.uint64)
+        self.shingles = {}  # youtube_id -> trigramas
+        self.doc_bands = {}  # youtube_id -> claves de banda
+        self.buckets = {}    # clave de banda -> youtube_ids
+
+    def has_id(self, youtube_id):
+        return youtube_id in self.row_hashes
+
+    def _shingles(self, title, artist):
+        text = f" {song_fingerprint(title, artist)} "
+        return {text[i:i + self.SHINGLE_SIZE] for i in range(len(text) - self.SHINGLE_SIZE + 1)} if text.strip() else set()
+
+    def _bands(self, shingles):
+        hashes = np.fromiter((zlib.crc32(s.encode()) % self.PRIME for s in shingles), dtype=np.uint64)
+        signature = ((self.perm_a[:, None] * hashes[None, :] + self.perm_b[:, None]) % self.PRIME).min(axis=1)
+        rows = self.NUM_PERM // self.BANDS
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.BANDS)]
+
+    def _index(self, youtube_id, fields):
+        shingles = self._shingles(fields['titulo_cancion'], fields['artista'])
+        if not shingles:
+            return
+        self.shingles[youtube_id] = shingles
+        self.doc_bands[youtube_id] = self._bands(shingles)
+        for key in self.doc_bands[youtube_id]:
+            self.buckets.setdefault(key, set()).add(youtube_id)
+
+    def _unindex(self, youtube_id):
+        self.shingles.pop(youtube_id, None)
+        for key in self.doc_bands.pop(youtube_id, []):
+            self.buckets[key].discard(youtube_id)
+            if not self.buckets[key]:
+                del self.buckets[key]
+
+    def find_similar(self, title, artist, limit=5):
+        """[(youtube_id, similitud)] de las canciones parecidas, de más a menos parecida"""
+        shingles = self._shingles(title, artist)
+        if not shingles:
+            return []
+        with self.lock:
+            candidates = set()
+            for key in self._bands(shingles):
+                candidates |= self.buckets.get(key, set())
+            similar = []
+            for youtube_id in candidates:
+                other = self.shingles[youtube_id]
+                similarity = len(shingles & other) / len(shingles | other)
+                if similarity >= self.THRESHOLD:
+                    similar.append((youtube_id, similarity))
+        return sorted(similar, key=lambda item: item[1], reverse=True)[:limit]
+
+@st.cache_resource
+def get_duplicate_index():
+    return DuplicateIndex()
+
+def find_similar_songs(data, title, artist):
+    """Sugerencias de data con título y artista parecidos"""
+    index = get_duplicate_index()
+    index.sync(data)
+    return index.find_similar(title, artist)
+
+@st.cache_resource
+def get_search_index():
+    return SearchIndex()
+
+def search_songs(data, query):
+    """youtube_ids de data que coinciden con la búsqueda, ordenados por relevancia"""
+    index = get_search_index()
+    index.sync(data)
+    return index.search(query)
+
+# Vista filtrada y ordenada de "Ver Sugerencias"
+FACET_COLUMNS = ('genero', 'dificultad', 'sugerido_por')
+SORT_ORDERS = {
+    "Más recientes": ('fecha_sugerencia', False),
+    "Más antiguas": ('fecha_sugerencia', True),
+    "Más votadas": ('votos_count', False),
+    "Título": ('titulo_cancion', True),
+}
+
+@st.cache_resource(max_entries=8)
+def build_facet_options(_data, version):
+    """Opciones de los filtros, calculadas una vez por versión de los datos"""
+    return {column: ["Todos"] + sorted(_data[column].unique().tolist()) for column in FACET_COLUMNS}
+
+@st.cache_resource(max_entries=64)
+def build_view_positions(_data, version, votes_version, query, filters, orden):
+    """Posiciones de las filas de _data que pasan la búsqueda y los filtros, en el orden pedido.
+
+    Se guardan en un LRU por (versión, filtros, orden): los reruns que no cambian
+    la vista (p. ej. un voto en otra tarjeta) no repiten el trabajo de pandas.
+    """
+    positions = np.arange(len(_data))
+    if query:
+        # Si un youtube_id está repetido, la búsqueda devuelve su primera fila
+        ids = _data['youtube_id'].reset_index(drop=True).drop_duplicates()
+        found = pd.Index(ids).get_indexer(search_songs(_data, query))
+        positions = ids.index.to_numpy()[found[found >= 0]]
+
+    mask = np.ones(len(_data), dtype=bool)
+    for column, values in filters:
+        if values:
+            mask &= _data[column].isin(values).to_numpy()
+    positions = positions[mask[positions]]
+
+    if orden in SORT_ORDERS:
+        column, ascending = SORT_ORDERS[orden]
+        if column in _data.columns:
+            values = _data[column].iloc[positions].reset_index(drop=True)
+            positions = positions[values.sort_values(ascending=ascending, kind='stable').index.to_numpy()]
+    return positions
+
+def filter_songs(data, query, filters, orden):
+    """Posiciones de data según la búsqueda, los filtros ({columna: valores}) y el orden"""
+    filters = tuple(
+        (column, () if "Todos" in values else tuple(sorted(values)))
+        for column, values in sorted(filters.items())
+    )
+    # Los votos solo afectan al orden "Más votadas"
+    votes_version = data.attrs.get('votes_version') if orden == "Más votadas" else None
+    return build_view_positions(data, data.attrs.get('version'), votes_version,
+                                query.strip(), filters, orden)
+
+# Agregados de la pestaña "Estadísticas"
+class SongStats(IncrementalSongIndex):
+    """Conteos por género, dificultad y persona, canciones recientes y más votadas.
+
+    Se mantienen fila a fila al cambiar las canciones; las más votadas se
+    recalculan solo cuando cambia el índice de votos.
+    """
+
+    COLUMNS = ['titulo_cancion', 'artista', 'genero', 'dificultad', 'sugerido_por', 'fecha_sugerencia']
+    COUNTERS = {'genero': 'by_genre', 'dificultad': 'by_difficulty', 'sugerido_por': 'by_person'}
+
+    def __init__(self):
+        super().__init__()
+        self.songs = {}  # youtube_id -> campos de la canción
+        self.by_genre = collections.Counter()
+        self.by_difficulty = collections.Counter()
+        self.by_person = collections.Counter()
+        self.by_date = []  # (fecha, youtube_id) ordenada por fecha
+        self.vote_index = None
+        self.top_voted = None
+
+    @staticmethod
+    def _date_key(fields, youtube_id):
+        fecha = fields['fecha_sugerencia']
+        return (str(fecha) if pd.notna(fecha) else "", youtube_id)
+
+    def _index(self, youtube_id, fields):
+        self.songs[youtube_id] = fields
+        for column, counter in self.COUNTERS.items():
+            getattr(self, counter)[fields[column]] += 1
+        bisect.insort(self.by_date, self._date_key(fields, youtube_id))
+        self.top_voted = None
+
+    def _unindex(self, youtube_id):
+        fields = self.songs.pop(youtube_id)
+        for column, counter in self.COUNTERS.items():
+            counter = getattr(self, counter)
+            counter[fields[column]] -= 1
+            if counter[fields[column]] <= 0:
+                del counter[fields[column]]
+        del self.by_date[bisect.bisect_left(self.by_date, self._date_key(fields, youtube_id))]
+        self.top_voted = None
+
+    def sync_votes(self, vote_index):
+        with self.lock:
+            if vote_index is not self.vote_index:
+                self.vote_index = vote_index
+                self.top_voted = None
+
+    def top(self, n):
+        """Las n canciones con más votos: [(youtube_id, votos)]"""
+        with self.lock:
+            if self.top_voted is None or len(self.top_voted) < min(n, len(self.songs)):
+                counts = self.vote_index.counts if self.vote_index else {}
+                voted = heapq.nlargest(n, ((youtube_id, count) for youtube_id, count in counts.items()
+                                           if youtube_id in self.songs), key=lambda item: item[1])
+                # Completar con canciones sin votos si hay menos de n votadas
+                voted_ids = {youtube_id for youtube_id, _ in voted}
+                voted += itertools.islice(((youtube_id, 0) for youtube_id in self.songs
+                                           if youtube_id not in voted_ids), n - len(voted))
+                self.top_voted = voted
+            return self.top_voted[:n]
+
+    def recent(self, n):
+        """youtube_ids de las n sugerencias más recientes"""
+        with self.lock:
+            return [youtube_id for _, youtube_id in reversed(self.by_date[-n:])]
+
+    def counts(self, name):
+        with self.lock:
+            return pd.Series(dict(getattr(self, name).most_common()), dtype=int)
+
+@st.cache_resource
+def get_song_stats():
+    return SongStats()
+
+def load_song_stats():
+    """Estadísticas al día con las canciones y votos actuales"""
+    stats = get_song_stats()
+    stats.sync(load_data())
+    stats.sync_votes(load_vote_index())
+    return stats
+
+# Con st.fragment un clic solo vuelve a ejecutar la sección que lo contiene, no toda
+# la app (versiones anteriores de Streamlit lo llaman experimental_fragment)
+def plain_function(func=None, **kwargs):
+    """Sustituto de st.fragment en versiones sin fragmentos: la función es parte de la app"""
+    return func if func is not None else (lambda func: func)
+
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or plain_function
+
+@fragment(run_every=SYNC_SECONDS)
+def watch_data_version():
+    """Vuelve a ejecutar la app cuando el hilo de sincronización encuentra datos nuevos"""
+    version = get_data_sync().version
+    if st.session_state.setdefault("data_version", version) != version:
+        st.session_state.data_version = version
+        st.rerun()
+
+# Función para la página de inicio de sesión
+def login_page():
+    st.title("🎵 P27 - Gestor de Sugerencias")
+    st.header("Iniciar Sesión")
+    
+    # Verificar si hay un mensaje de redirección
+    if 'show_login_message' in st.session_state and st.session_state.show_login_message:
+        st.success("Inicio de sesión exitoso! Redirigiendo...")
+        # Limpiar el flag después de mostrar el mensaje
+        st.session_state.show_login_message = False
+        # Código JavaScript para recargar después de 1 segundo
+        st.markdown(
+            """
+            <script>
+                setTimeout(function() {
+                    window.location.reload();
+                }, 1000);
+            </script>
+            """,
+            unsafe_allow_html=True
+        )
+    
+    login_col1, login_col2 = st.columns([1, 1])
+    
+    with login_col1:
+        with st.form("login_form"):
+            username = st.text_input("Usuario")
+            password = st.text_input("Contraseña", type="password")
+            submitted = st.form_submit_button("Iniciar Sesión")
+            
+            if submitted:
+                # Usuarios, canciones y votos llegan juntos para la primera página
+                get_storage().prefetch()
+                if check_credentials(username, password):
+                    # Actualizar estado de sesión
+                    st.session_state.logged_in = True
+                    st.session_state.username = username
+                    st.session_state.user_info = get_user_info(username)
+                    st.session_state.show_login_message = True
+                    st.rerun()  # Intentar rerun aquí es más seguro ahora
+                else:
+                    st.error("Usuario o contraseña incorrectos")
+        
+        # Enlace para recuperar contraseña
+        st.markdown("---")
+        st.markdown("¿Olvidaste tu contraseña? Contacta al administrador para restablecerla.")
+    
+    with login_col2:
+        st.info("Si eres miembro del grupo y no tienes cuenta, contacta al administrador para que te registre.")
+        
+# Función para cambiar contraseña del usuario
+def change_password_page():
+    st.header("Cambiar Contraseña")
+    
+    with st.form("change_password_form"):
+        current_password = st.text_input("Contraseña Actual", type="password")
+        new_password = st.text_input("Nueva Contraseña", type="password")
+        confirm_password = st.text_input("Confirmar Nueva Contraseña", type="password")
+        
+        submitted = st.form_submit_button("Cambiar Contraseña")
+        
+        if submitted:
+            username = st.session_state.username
+            
+            if not check_credentials(username, current_password):
+                st.error("La contraseña actual es incorrecta")
+            elif new_password != confirm_password:
+                st.error("Las nuevas contraseñas no coinciden")
+            elif not new_password:
+                st.error("La nueva contraseña no puede estar vacía")
+            else:
+                if change_password(username, new_password):
+                    st.success("Contraseña cambiada correctamente")
+                    # Actualizar información de sesión
+                    st.session_state.user_info = get_user_info(username)
+                else:
+                    st.error("Error al cambiar la contraseña")
+
+# Función para la página de administración de usuarios
+@fragment
+def admin_page():
+    st.title("Administración de Usuarios")
+    
+    users = load_users()
+    
+    st.header("Usuarios Registrados")
+    
+    # La tabla se rellena al final, cuando ya se procesaron los formularios
+    tabla_usuarios = st.empty()
+    
+    # Agregar nuevo usuario
+    st.header("Agregar Nuevo Usuario")
+    
+    with st.form("new_user_form"):
+        new_username = st.text_input("Nombre de Usuario")
+        new_password = st.text_input("Contraseña", type="password")
+        new_nombre = st.text_input("Nombre Completo")
+        new_rol = st.selectbox("Rol", ["miembro", "admin"])
+        
+        submit_new_user = st.form_submit_button("Registrar Usuario")
+        
+        if submit_new_user:
+            if new_username in users:
+                st.error("Este nombre de usuario ya está en uso")
+            elif not new_username or not new_password or not new_nombre:
+                st.error("Todos los campos son requeridos")
+            else:
+                new_user = {
+                    "password": hash_password(new_password),
+                    "nombre": new_nombre,
+                    "rol": new_rol
+                }
+                if save_user(new_username, new_user):
+                    st.success(f"Usuario {new_username} registrado correctamente")
+                    users = load_users()
+                else:
+                    st.error("Error al guardar el nuevo usuario")
+    
+    # Importación masiva de canciones
+    st.header("Importar Canciones")
+    
+    with st.form("import_songs_form", clear_on_submit=True):
+        archivo = st.file_uploader("Archivo CSV (columnas: url y opcionalmente titulo_cancion, artista, "
+                                   "genero, dificultad, notas, sugerido_por, fecha_sugerencia)", type="csv")
+        urls = st.text_area("O pega URLs de YouTube, una por línea:", height=150)
+        
+        submit_import = st.form_submit_button("Importar")
+        
+        if submit_import:
+            entries = read_import_entries(archivo, urls)
+            nuevas, omitidas = prepare_import(entries, load_data(), st.session_state.user_info['nombre'])
+            
+            if not nuevas:
+                st.warning("No hay canciones nuevas para importar.")
+            elif add_songs(nuevas):
+                st.success(f"Se importaron {len(nuevas)} canciones.")
+            else:
+                st.error("Error al guardar las canciones importadas")
+            
+            if omitidas:
+                st.write(f"Se omitieron {len(omitidas)} entradas:")
+                st.table(pd.DataFrame(omitidas, columns=["Línea", "URL", "Motivo"]))
+    
+    # Sección para restablecer contraseñas
+    st.header("Restablecer Contraseña de Usuario")
+    
+    with st.form("reset_password_form"):
+        username_to_reset = st.selectbox("Seleccionar Usuario", list(users.keys()))
+        new_password_reset = st.text_input("Nueva Contraseña", type="password", key="reset_pwd")
+        confirm_reset = st.text_input("Confirmar Nueva Contraseña", type="password", key="confirm_reset")
+        
+        submit_reset = st.form_submit_button("Restablecer Contraseña")
+        
+        if submit_reset:
+            if not new_password_reset:
+                st.error("La nueva contraseña no puede estar vacía")
+            elif new_password_reset != confirm_reset:
+                st.error("Las contraseñas no coinciden")
+            else:
+                if reset_password(username_to_reset, new_password_reset):
+                    st.success(f"Contraseña del usuario {username_to_reset} restablecida correctamente")
+                else:
+                    st.error("Error al restablecer la contraseña")
+    
+    # Cambios que GitHub rechazó: quedan apartados hasta que un administrador decida
+    rechazados = get_storage().rejected_changes()
+    if rechazados:
+        st.header("Cambios Rechazados")
+        st.warning(f"GitHub rechazó {len(rechazados)} cambios. Los siguientes se publicaron igualmente; "
+                   "estos esperan a que los reintentes o los descartes.")
+        for entry in rechazados:
+            col_info, col_reintentar, col_descartar = st.columns([4, 1, 1])
+            with col_info:
+                st.write(f"**{entry['op']}** ({entry['ts']}): {entry['error']}")
+            with col_reintentar:
+                st.button("Reintentar", key=f"retry_{entry['id']}",
+                          on_click=resolve_rejected_change, args=(entry['id'], True))
+            with col_descartar:
+                st.button("Descartar", key=f"discard_{entry['id']}",
+                          on_click=resolve_rejected_change, args=(entry['id'], False))
+    
+    # Mostrar usuarios existentes
+    tabla_usuarios.table(pd.DataFrame([
+        {"Usuario": username, "Nombre": info["nombre"], "Rol": info["rol"]}
+        for username, info in users.items()
+    ]))
+
+# Opciones de tamaño de página para la lista de sugerencias
+PAGE_SIZE_OPTIONS = [12, 24, 48, 96]
+
+@fragment
+def vote_control(video_id, username):
+    """Conteo de me gusta y botón de voto de una tarjeta"""
+    vote_index = load_vote_index()
+    st.markdown(f"👍 **{vote_index.count(video_id)}** me gusta")
+    
+    # El voto se registra en el callback, antes de volver a dibujar el fragmento
+    if vote_index.has_voted(video_id, username):
+        st.button("Quitar me gusta 👎", key=f"vote_{video_id}",
+                  on_click=vote_song, args=(video_id, username, False))
+    else:
+        st.button("Me gusta 👍", key=f"vote_{video_id}",
+                  on_click=vote_song, args=(video_id, username, True))
+
+@fragment
+def suggestion_form():
+    """Formulario de nueva sugerencia"""
+    data = load_data()
+    
+    with st.form("nueva_sugerencia"):
+        youtube_url = st.text_input("URL de YouTube:")
+        titulo_cancion = st.text_input("Título de la Canción:")
+        artista = st.text_input("Artista:")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            genero = st.selectbox("Género:", GENRE_OPTIONS)
+            dificultad = st.select_slider("Dificultad estimada:", options=DIFFICULTY_LEVELS)
+        
+        with col2:
+            # El nombre del usuario se obtiene automáticamente
+            sugerido_por = st.session_state.user_info['nombre']
+            st.write(f"Sugerido por: {sugerido_por}")
+            notas = st.text_area("Notas adicionales:", height=100)
+        
+        confirmar_parecida = st.checkbox("Es una canción distinta aunque se parezca a otra sugerencia")
+        submitted = st.form_submit_button("Enviar Sugerencia")
+        
+        if submitted:
+            if not youtube_url:
+                st.error("Por favor, ingresa la URL de YouTube.")
+            else:
+                video_id = extract_youtube_id(youtube_url)
+                
+                if not video_id:
+                    st.error("URL de YouTube no válida. Por favor, verifica e intenta de nuevo.")
+                elif video_exists(video_id, data):
+                    st.error("¡Esta canción ya ha sido sugerida! Revisa la lista de sugerencias existentes.")
+                else:
+                    # Solo se consulta el proveedor si hace falta el título del video
+                    video_info = get_video_info(video_id, fetch=not titulo_cancion)
+                    
+                    if not video_info:
+                        st.error("No se pudo obtener información del video. Verifica la URL.")
+                    elif not (titulo_cancion or video_info["title"]):
+                        st.error("No se pudo obtener el título del video. Escríbelo en el formulario.")
+                    else:
+                        if not titulo_cancion:
+                            titulo_cancion = video_info["title"]
+                        
+                        similares = [] if confirmar_parecida else find_similar_songs(data, titulo_cancion, artista)
+                        
+                        if similares:
+                            canciones = data.drop_duplicates('youtube_id').set_index('youtube_id')
+                            st.warning(
+                                "Esta canción se parece a sugerencias existentes:\n\n" +
+                                "\n".join(
+                                    f"- {canciones.at[youtube_id, 'titulo_cancion']} - "
+                                    f"{canciones.at[youtube_id, 'artista']} ({similitud:.0%})"
+                                    for youtube_id, similitud in similares
+                                ) +
+                                "\n\nSi es una canción distinta, marca la casilla y envíala de nuevo."
+                            )
+                        else:
+                            nueva_sugerencia = {
+                                'youtube_id': video_id,
+                                'url': youtube_url,
+                                'titulo_cancion': titulo_cancion,
+                                'artista': artista,
+                                'genero': genero,
+                                'dificultad': dificultad,
+                                'sugerido_por': sugerido_por,
+                                'fecha_sugerencia': datetime.now().strftime('%Y-%m-%d'),
+                                'notas': notas,
+                                'votos_count': 0
+                            }
+                        
+                            if add_song(nueva_sugerencia):
+                                # Dejar los metadatos listos para la lista de sugerencias
+                                prefetch_videos([video_id])
+                                st.success("¡Sugerencia añadida correctamente!")
+                                st.balloons()
+                            else:
+                                st.error("Error al guardar la sugerencia")
+
+# Función para la aplicación principal
+def main_app():
+    watch_data_version()
+    
+    # Título y pestañas principales
+    st.title("🎵 Gestor de Sugerencias Musicales")
+    st.markdown(f"Bienvenido, {st.session_state.user_info['nombre']} | "
+                f"[Cerrar Sesión](javascript:sessionStorage.clear();location.reload())")
+    
+    tabs = ["Nueva Sugerencia", "Ver Sugerencias", "Estadísticas", "Mi Cuenta"]
+    
+    # Si es administrador, mostrar pestaña de administración
+    if st.session_state.user_info.get("rol") == "admin":
+        tabs.append("Administración")
+    
+    tab_selection = st.tabs(tabs)
+    
+    # Pestaña 1: Nueva Sugerencia
+    with tab_selection[0]:
+        st.header("Añadir Nueva Sugerencia")
+        
+        suggestion_form()
+    
+    # Pestaña 2: Ver Sugerencias
+    with tab_selection[1]:
+        st.header("Canciones Sugeridas")
+        
+        data = load_songs_with_votes()
+        
+        if data.empty:
+            st.info("Aún no hay sugerencias de canciones.")
+        else:
+            # Búsqueda por texto
+            busqueda = st.text_input("Buscar por título, artista o notas:", key="busqueda_sugerencias")
+            
+            # Filtros
+            st.subheader("Filtros")
+            col1, col2, col3, col4 = st.columns(4)
+            
+            opciones_filtro = build_facet_options(data, data.attrs.get('version'))
+            
+            with col1:
+                filtro_genero = st.multiselect("Filtrar por género:", opciones_filtro['genero'])
+            
+            with col2:
+                filtro_dificultad = st.multiselect("Filtrar por dificultad:", opciones_filtro['dificultad'])
+            
+            with col3:
+                filtro_persona = st.multiselect("Filtrar por persona:", opciones_filtro['sugerido_por'])
+            
+            with col4:
+                opciones_orden = list(SORT_ORDERS)
+                if busqueda.strip():
+                    opciones_orden = ["Relevancia"] + opciones_orden
+                orden = st.selectbox("Ordenar por:", opciones_orden)
+            
+            # Aplicar búsqueda, filtros y ordenamiento (memorizados por versión de los datos)
+            posiciones = filter_songs(data, busqueda, {
+                'genero': filtro_genero,
+                'dificultad': filtro_dificultad,
+                'sugerido_por': filtro_persona,
+            }, orden)
+            
+            # Mostrar resultados
+            st.subheader(f"Mostrando {len(posiciones)} sugerencias")
+            
+            # Paginación: solo se construyen las tarjetas de la página visible
+            col_tamano, col_pagina = st.columns([1, 1])
+            with col_tamano:
+                page_size = st.selectbox("Canciones por página:", PAGE_SIZE_OPTIONS, key="tamano_pagina")
+            total_pages = max(1, -(-len(posiciones) // page_size))
+            # La página vive solo en session_state (sin value=) para poder ajustarla aquí
+            if st.session_state.get("pagina_sugerencias", 1) > total_pages:
+                st.session_state.pagina_sugerencias = total_pages
+            st.session_state.setdefault("pagina_sugerencias", 1)
+            with col_pagina:
+                page = st.number_input(f"Página (de {total_pages}):", min_value=1, max_value=total_pages,
+                                       step=1, key="pagina_sugerencias")
+            
+            data_pagina = data.iloc[posiciones[(page - 1) * page_size:page * page_size]]
+            
+            username = st.session_state.username
+            
+            # Metadatos de los videos de la página solo desde la cache; los que faltan se
+            # piden en segundo plano y aparecen en la siguiente actualización
+            videos = resolve_videos(data_pagina['youtube_id'], fetch=False)
+            prefetch_videos(data_pagina['youtube_id'])
+            
+            # Mostrar en tarjetas
+            num_cols = 3
+            cols = st.columns(num_cols)
+            
+            for i, (idx, row) in enumerate(data_pagina.iterrows()):
+                col = cols[i % num_cols]
+                
+                with col:
+                    st.markdown("---")
+                    video_id = row['youtube_id']
+                    
+                    # Miniatura clicable (carga diferida) e información de la canción en un solo bloque.
+                    # Se escapan los textos de los usuarios porque el bloque admite HTML
+                    texto = {campo: html.escape(str(row[campo])) for campo in
+                             ('youtube_id', 'titulo_cancion', 'artista', 'genero', 'dificultad',
+                              'sugerido_por')}
+                    texto['fecha_sugerencia'] = format_date(row['fecha_sugerencia'])
+                    video_info = videos.get(video_id)
+                    detalle_video = ""
+                    if video_info:
+                        partes = [video_info['channel'], format_duration(video_info['duration'])]
+                        detalle_video = "▶️ " + " · ".join(html.escape(p) for p in partes if p) + "  \n"
+                    st.markdown(
+                        f'<a href="https://www.youtube.com/watch?v={texto["youtube_id"]}" target="_blank">'
+                        f'<img src="https://img.youtube.com/vi/{texto["youtube_id"]}/mqdefault.jpg" loading="lazy" '
+                        f'width="100%" alt="Miniatura"></a>\n\n'
+                        f"**{texto['titulo_cancion']}**  \n"
+                        f"Artista: {texto['artista']}  \n"
+                        f"Género: {texto['genero']} | Dificultad: {texto['dificultad']}  \n"
+                        f"{detalle_video}"
+                        f"**👤 Sugerido por:** {texto['sugerido_por']} ({texto['fecha_sugerencia']})",
+                        unsafe_allow_html=True
+                    )
+                    
+                    # Conteo y botón para votar/quitar voto (se actualizan sin recargar la app)
+                    vote_control(video_id, username)
+                    
+                    if pd.notna(row['notas']) and row['notas']:
+                        with st.expander("Notas"):
+                            st.write(row['notas'])
+                    
+                    # Botón para ver en YouTube
+                    st.markdown(f"[Ver en YouTube](https://www.youtube.com/watch?v={video_id})")
+    
+    # Pestaña 3: Estadísticas
+    with tab_selection[2]:
+        st.header("Estadísticas")
+        
+        stats = load_song_stats()
+        
+        if not stats.songs:
+            st.info("No hay datos suficientes para mostrar estadísticas.")
+        else:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Gráfico de canciones por género
+                st.subheader("Canciones por Género")
+                st.bar_chart(stats.counts('by_genre'))
+            
+            with col2:
+                # Gráfico de canciones por dificultad
+                st.subheader("Canciones por Dificultad")
+                dificultad_orden = {"Fácil": 1, "Intermedia": 2, "Difícil": 3, "Muy difícil": 4}
+                dificultad_counts = stats.counts('by_difficulty').sort_index(key=lambda x: x.map(dificultad_orden))
+                st.bar_chart(dificultad_counts)
+            
+            # Top canciones más votadas
+            st.subheader("Top Canciones Más Populares")
+            top_songs = pd.DataFrame(
+                [(stats.songs[youtube_id]['titulo_cancion'], stats.songs[youtube_id]['artista'], votos)
+                 for youtube_id, votos in stats.top(5)],
+                columns=['Canción', 'Artista', 'Votos']
+            )
+            st.table(top_songs)
+            
+            # Top contribuyentes
+            st.subheader("Top Contribuyentes")
+            contribuyentes = stats.counts('by_person').reset_index()
+            contribuyentes.columns = ['Persona', 'Canciones Sugeridas']
+            st.table(contribuyentes.head(5))
+            
+            # Sugerencias recientes
+            st.subheader("Sugerencias Recientes")
+            recientes = pd.DataFrame(
+                [{'fecha_sugerencia': format_date(stats.songs[youtube_id]['fecha_sugerencia']),
+                  **{campo: stats.songs[youtube_id][campo] for campo in ('titulo_cancion', 'artista', 'sugerido_por')}}
+                 for youtube_id in stats.recent(5)]
+            )
+            st.table(recientes)
+    
+    # Pestaña 4: Mi Cuenta
+    with tab_selection[3]:
+        st.header("Mi Cuenta")
+        
+        # Mostrar información del usuario
+        st.subheader("Información de Usuario")
+        st.write(f"**Usuario:** {st.session_state.username}")
+        st.write(f"**Nombre:** {st.session_state.user_info['nombre']}")
+        st.write(f"**Rol:** {st.session_state.user_info['rol']}")
+        
+        # Sección para cambiar contraseña
+        st.subheader("Cambiar Contraseña")
+        change_password_page()
+        
+        # Mostrar sugerencias del usuario
+        st.subheader("Mis Sugerencias")
+        
+        data = load_data()
+        vote_index = load_vote_index()
+        user_suggestions = data[data['sugerido_por'] == st.session_state.user_info['nombre']]
+        
+        st.write(f"Te gustan {len(vote_index.songs_voted_by(st.session_state.username))} canciones.")
+        
+        if user_suggestions.empty:
+            st.info("Aún no has sugerido ninguna canción.")
+        else:
+            st.write(f"Has sugerido {len(user_suggestions)} canciones.")
+            
+            # Mostrar lista de sugerencias del usuario
+            for _, row in user_suggestions.iterrows():
+                with st.expander(f"{row['titulo_cancion']} - {row['artista']}"):
+                    st.write(f"**Género:** {row['genero']}")
+                    st.write(f"**Dificultad:** {row['dificultad']}")
+                    st.write(f"**Fecha de sugerencia:** {format_date(row['fecha_sugerencia'])}")
+                    st.write(f"**Votos:** {vote_index.count(row['youtube_id'])}")
+                    if pd.notna(row['notas']) and row['notas']:
+                        st.write(f"**Notas:** {row['notas']}")
+                    st.markdown(f"[Ver en YouTube](https://www.youtube.com/watch?v={row['youtube_id']})")
+    
+    # Pestaña 5: Administración (solo para admins)
+    if st.session_state.user_info.get("rol") == "admin" and len(tab_selection) > 4:
+        with tab_selection[4]:
+            admin_page()
+
+# Verificar estado de inicio de sesión
+if 'logged_in' not in st.session_state:
+    st.session_state.logged_in = False
+
+# Mostrar la página correspondiente
+if st.session_state.logged_in:
+    main_app()
+else:
+    login_page()
+
+# Pie de página
+st.markdown("---")
+st.markdown("Desarrollado con ❤️ para nuestro grupo P27 | © 2025")